@@ -0,0 +1,233 @@
+"""
+Agent4Employee 的统一命令行入口：python agent4employee.py <子命令> [选项]
+
+每个子命令只在运行时才导入它需要的分析模块，matplotlib / seaborn / plotly / scipy
+不会拖慢其他子命令的启动。summary 命令在汇总缓存命中时只用标准库。
+"""
+import argparse
+import os
+import sys
+
+# 这些子命令把剩余参数原样交给对应模块自己的命令行解析
+PASSTHROUGH = {
+    'predict': ('task4_code2', 'cli', "query the LLM for paired salary predictions"),
+    'stub': ('llm_stub_server', 'main', "serve a local stub of the chat-completions endpoint"),
+    'synth': ('synthetic_cohorts', 'main', "generate synthetic cohort CSV shards"),
+    'bench': ('benchmark', 'main', "time and memory-profile each analysis stage"),
+    'sweep': ('sweep', 'main', "run a model x temperature x system-prompt prediction sweep"),
+}
+STREAMING_HELP = "read the CSV shards in chunks (bounded memory); row-level outputs are skipped"
+
+
+def _streaming(args):
+    """--streaming / --chunksize 对应的关键字参数（不给 --chunksize 时用各函数自己的默认值）"""
+    options = {'streaming': args.streaming}
+    if args.chunksize is not None:
+        options['chunksize'] = args.chunksize
+    return options
+
+
+def _export_mode(value):
+    from plotly_export import EXPORT_MODES
+    if value not in EXPORT_MODES:
+        raise SystemExit(f"--export-mode must be one of {EXPORT_MODES}")
+    return value
+
+
+def cmd_summary(args):
+    from summary_cache import cohort_files, format_summary, load_cells, save_cells, summarize_cells
+
+    files = cohort_files(args.pattern)
+    if not files:
+        raise SystemExit("No CSV files found in the current directory!")
+    cells = None if args.refresh else load_cells(files)
+    if cells is None:
+        from aggregate_cube import CUBE_KEYS, TASK_METRICS, build_cube_streaming
+        from cohort_loader import iter_cohort_chunks
+        chunks = iter_cohort_chunks(files, columns=CUBE_KEYS + TASK_METRICS,
+                                    **({'chunksize': args.chunksize} if args.chunksize else {}))
+        cube = build_cube_streaming(chunks)
+        cells = save_cells(cube, files)
+    print(format_summary(summarize_cells(cells, args.by), args.by, cells['metrics']))
+
+
+def cmd_trends(args):
+    import task1_code1
+    task1_code1.main(workers=args.workers, incremental=not args.no_incremental, n_permutations=args.permutations,
+                     **_streaming(args))
+
+
+def cmd_gaps(args):
+    import task1_code2
+    task1_code2.main(workers=args.workers, incremental=not args.no_incremental, n_resamples=args.resamples,
+                     **_streaming(args))
+
+
+def cmd_interactive(args):
+    import task2_code1
+    task2_code1.main(workers=args.workers, incremental=not args.no_incremental,
+                     export_mode=_export_mode(args.export_mode), report=not args.no_report,
+                     **_streaming(args))
+
+
+def cmd_dashboard(args):
+    import task2_code2
+    task2_code2.main(workers=args.workers, incremental=not args.no_incremental,
+                     export_mode=_export_mode(args.export_mode))
+
+
+def cmd_progression(args):
+    import task3_code1
+    task3_code1.main(workers=args.workers, incremental=not args.no_incremental)
+
+
+def cmd_salary(args):
+    import task3_code2
+    task3_code2.main(workers=args.workers, incremental=not args.no_incremental)
+
+
+def cmd_salary_growth(args):
+    import task3_code3
+    task3_code3.main(args.female, args.male)
+
+
+def cmd_extract(args):
+    import task4_code3
+    task4_code3.main('.', args.symbol, args.max_lines)
+
+
+def cmd_compare(args):
+    import task4_code1
+    task4_code1.main(args.male, args.female)
+
+
+def cmd_experiment(args):
+    import salary_experiment
+    salary_experiment.main(workers=args.workers, force=args.force, dry_run=args.dry_run, api_base=args.api_base,
+                           concurrency=args.concurrency, requests_per_minute=args.rpm,
+                           tokens_per_minute=args.tpm, cache_path=None if args.no_cache else args.cache,
+                           symbol=args.symbol, max_lines=args.max_lines, batch_size=args.batch_size)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='agent4employee', description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-C', '--data-dir', help="run in this directory (default: current directory)")
+    common.add_argument('--profile', metavar='DIR',
+                        help="write per-stage timings to DIR/profile.json and DIR/profile_trace.json "
+                             "(Chrome trace format) and print a summary table")
+
+    rendering = argparse.ArgumentParser(add_help=False)
+    rendering.add_argument('--workers', type=int,
+                           help="loader, render and analysis processes (default: all CPU cores)")
+    rendering.add_argument('--no-incremental', action='store_true', help="re-render figures even if unchanged")
+
+    streaming = argparse.ArgumentParser(add_help=False)
+    streaming.add_argument('--streaming', action='store_true', help=STREAMING_HELP)
+    streaming.add_argument('--chunksize', type=int, help="rows per streamed chunk (default: 1,000,000)")
+
+    sub = subparsers.add_parser('summary', parents=[common], help="task mean/std per group (task1/task2 data)")
+    sub.add_argument('--by', nargs='+', default=['Group_Type', 'Gender'])
+    sub.add_argument('--pattern', default="*.csv")
+    sub.add_argument('--chunksize', type=int, help="rows per chunk when the cube has to be rebuilt")
+    sub.add_argument('--refresh', action='store_true', help="ignore the cached summary cube")
+    sub.set_defaults(func=cmd_summary)
+
+    sub = subparsers.add_parser('trends', parents=[common, rendering, streaming],
+                                help="task trends and permutation tests (task1_code1)")
+    sub.add_argument('--permutations', type=int, default=10000)
+    sub.set_defaults(func=cmd_trends)
+
+    sub = subparsers.add_parser('gaps', parents=[common, rendering, streaming],
+                                help="performance mirror, task trends and bootstrap gaps (task1_code2)")
+    sub.add_argument('--resamples', type=int, default=10000)
+    sub.set_defaults(func=cmd_gaps)
+
+    sub = subparsers.add_parser('interactive', parents=[common, rendering, streaming],
+                                help="interactive Plotly charts and report (task2_code1)")
+    sub.add_argument('--export-mode', default='shared', help="full, shared or cdn")
+    sub.add_argument('--no-report', action='store_true')
+    sub.set_defaults(func=cmd_interactive)
+
+    sub = subparsers.add_parser('dashboard', parents=[common, rendering],
+                                help="interactive performance dashboard (task2_code2)")
+    sub.add_argument('--export-mode', default='shared', help="full, shared or cdn")
+    sub.set_defaults(func=cmd_dashboard)
+
+    sub = subparsers.add_parser('progression', parents=[common, rendering],
+                                help="salary progression and promotion trajectories (task3_code1)")
+    sub.set_defaults(func=cmd_progression)
+
+    sub = subparsers.add_parser('salary', parents=[common, rendering],
+                                help="salary growth, growth rates and gap tests (task3_code2)")
+    sub.set_defaults(func=cmd_salary)
+
+    sub = subparsers.add_parser('salary-growth', parents=[common],
+                                help="growth from predicted salary matrices (task3_code3)")
+    sub.add_argument('--female', default='female_salary.csv')
+    sub.add_argument('--male', default='male_salary.csv')
+    sub.set_defaults(func=cmd_salary_growth)
+
+    sub = subparsers.add_parser('extract', parents=[common],
+                                help="parse prediction files into salary matrices (task4_code3)")
+    sub.add_argument('--symbol', default='$')
+    sub.add_argument('--max-lines', type=int, default=100)
+    sub.set_defaults(func=cmd_extract)
+
+    sub = subparsers.add_parser('compare', parents=[common],
+                                help="paired male/female comparison of salary matrices (task4_code1)")
+    sub.add_argument('--male', default='male_salary.csv')
+    sub.add_argument('--female', default='female_salary.csv')
+    sub.set_defaults(func=cmd_compare)
+
+    sub = subparsers.add_parser('experiment', parents=[common],
+                                help="run predict -> extract -> compare / plot (task4), skipping unchanged stages")
+    sub.add_argument('--workers', type=int, help="stages run in parallel (default: all CPU cores)")
+    sub.add_argument('--force', action='store_true', help="re-run every stage")
+    sub.add_argument('--dry-run', action='store_true', help="only show which stages would run")
+    sub.add_argument('--api-base', help="chat-completions endpoint (e.g. a local stub server)")
+    sub.add_argument('--concurrency', type=int, default=8, help="max in-flight requests")
+    sub.add_argument('--rpm', type=int, default=500, help="requests per minute")
+    sub.add_argument('--tpm', type=int, default=300000, help="tokens per minute")
+    sub.add_argument('--batch-size', type=int, default=1, help="employees per request (JSON replies)")
+    sub.add_argument('--cache', default='llm_response_cache.sqlite', help="SQLite response cache path")
+    sub.add_argument('--no-cache', action='store_true', help="always query the API")
+    sub.add_argument('--symbol', default='$')
+    sub.add_argument('--max-lines', type=int, default=100)
+    sub.set_defaults(func=cmd_experiment)
+
+    for name, (module, _, help_text) in PASSTHROUGH.items():
+        subparsers.add_parser(name, add_help=False, help=f"{help_text} ({module}; options passed through)")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # 转交给模块自己的解析器（包括 --help）
+    if argv and argv[0] in PASSTHROUGH:
+        module_name, func_name, _ = PASSTHROUGH[argv[0]]
+        module = __import__(module_name)
+        return getattr(module, func_name)(argv[1:])
+
+    args = build_parser().parse_args(argv)
+    # 相对于启动目录解析，之后才切换到数据目录
+    profile_dir = os.path.abspath(args.profile) if args.profile else None
+    if args.data_dir:
+        os.chdir(args.data_dir)
+    if profile_dir is None:
+        return args.func(args)
+
+    import profiling
+    try:
+        with profiling.stage(args.command, 'command'):
+            return args.func(args)
+    finally:
+        json_path, trace_path = profiling.write_trace(profile_dir)
+        print(f"\nProfile ({json_path}, {trace_path}):")
+        print(profiling.format_summary())
+
+
+if __name__ == "__main__":
+    main()
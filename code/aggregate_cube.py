@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+from profiling import profiled, stage
+
+CUBE_KEYS = ['Group_Type', 'Gender', 'Year', 'Department', 'Performance']
+TASK_METRICS = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
+
+
+@profiled(category='aggregate')
+def build_cube(df, metrics=TASK_METRICS, keys=CUBE_KEYS):
+    """
+    一次分组聚合得到按 keys 划分的立方体：每个格子记录 count 以及每个指标的 sum 和 m2
+    （格子内离差平方和，两遍法计算，不会像 sumsq - sum²/n 那样在大样本下损失精度）。
+    之后所有图表和汇总表都从立方体上卷得到，成本只与分组数有关，与行数无关。
+    """
+    keys = [k for k in keys if k in df.columns]
+    metrics = list(metrics)
+    values = df[keys + metrics].copy()
+    values['count'] = 1
+    grouped = values.groupby(keys, observed=True, dropna=False)
+    for metric in metrics:
+        deviation = values[metric].astype(float) - grouped[metric].transform('mean')
+        values[f'{metric}_m2'] = deviation ** 2
+
+    cube = values.groupby(keys, observed=True, dropna=False).sum()
+    cube = cube.rename(columns={metric: f'{metric}_sum' for metric in metrics})
+    cube.attrs['metrics'] = metrics
+    return cube
+
+
+def rollup(cube, by):
+    """
+    把立方体汇总到 by 这几个维度。count 和 sum 直接相加，
+    m2 按 Chan 的并行合并公式：各格子的 m2 之和加上格子均值相对分组均值的离差平方和（按 count 加权）。
+    """
+    by = list(by)
+    metrics = cube.attrs['metrics']
+    grouped = cube.groupby(level=by, observed=True, dropna=False)
+    rolled = grouped[['count'] + [f'{metric}_sum' for metric in metrics]].sum()
+
+    n = cube['count'].astype(float)
+    total_n = grouped['count'].transform('sum').astype(float)
+    for metric in metrics:
+        total = cube[f'{metric}_sum']
+        shift = total / n - grouped[f'{metric}_sum'].transform('sum') / total_n
+        m2 = cube[f'{metric}_m2'] + n * shift ** 2
+        rolled[f'{metric}_m2'] = m2.groupby(level=by, observed=True, dropna=False).sum()
+    rolled = rolled[list(cube.columns)]
+    rolled.attrs['metrics'] = metrics
+    return rolled
+
+
+def merge_cubes(cubes):
+    """合并在不同数据分片上建立的同维度立方体（结果与在合并后的数据上直接建立相同）"""
+    cubes = list(cubes)
+    merged = pd.concat(cubes)
+    merged.attrs['metrics'] = cubes[0].attrs['metrics']
+    return rollup(merged, merged.index.names)
+
+
+def build_cube_streaming(chunks, metrics=TASK_METRICS, keys=CUBE_KEYS):
+    """
+    逐块建立立方体并立即合并到累计结果中：内存占用只取决于块大小和分组数，与总行数无关，
+    可以处理比内存大的数据。chunks 是数据框的可迭代对象（例如 cohort_loader.iter_cohort_chunks）。
+    """
+    cube = None
+    with stage('build_cube_streaming', 'aggregate') as current:
+        for chunk in chunks:
+            part = build_cube(chunk, metrics, keys)
+            cube = part if cube is None else merge_cubes([cube, part])
+        if cube is None:
+            raise ValueError("No data to aggregate")
+        current.rows = int(cube['count'].sum())
+    return cube
+
+
+def cube_counts(cube, by):
+    """各分组的行数"""
+    return rollup(cube, by)['count']
+
+
+@profiled(category='aggregate')
+def cube_stats(cube, by, metrics=None, stats=('mean', 'std')):
+    """
+    从立方体计算各分组的统计量，返回与 df.groupby(by).agg({m: list(stats)}) 相同形状的数据框。
+    支持 mean / std / var / sem / count / sum。
+    """
+    metrics = list(metrics if metrics is not None else cube.attrs['metrics'])
+    rolled = rollup(cube, by)
+    n = rolled['count'].astype(float)
+
+    columns = {}
+    for metric in metrics:
+        total = rolled[f'{metric}_sum']
+        mean = total / n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = rolled[f'{metric}_m2'] / (n - 1)
+        var = var.where(n > 1)
+        computed = {
+            'mean': mean,
+            'var': var,
+            'std': np.sqrt(var),
+            'sem': np.sqrt(var / n),
+            'count': rolled['count'],
+            'sum': total,
+        }
+        for stat in stats:
+            columns[(metric, stat)] = computed[stat]
+    return pd.DataFrame(columns)
@@ -0,0 +1,225 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from profiling import reset_peak_rss, stage
+from synthetic_cohorts import write_cohorts
+
+TASKS = ('task1', 'task2', 'task3', 'task4')
+STAGES = ('load', 'aggregate', 'stats', 'render')
+DEFAULT_SIZES = [1000, 10000, 100000]
+RESULTS_PATH = "benchmark_results.json"
+
+
+def measure(func, *args):
+    """
+    运行一次 func，返回 (结果, 墙钟秒数, CPU秒数, 峰值内存增量MB)。
+    Linux 上用 RSS 峰值（不影响计时，func 内部的 profiling 阶段也不会打乱峰值）；
+    其他平台退回到 tracemalloc（只统计 Python/NumPy 分配，计时会偏慢）。
+    """
+    if reset_peak_rss():
+        with stage(getattr(func, '__qualname__', 'measure'), 'benchmark') as current:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = func(*args)
+        return result, current.wall, current.cpu, current.peak - current.rss_start
+
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func(*args)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    return result, wall, cpu, peak
+
+
+def _render_task1(cube, experimental):
+    import task1_code1
+    import task1_code2
+    for metric in cube.attrs['metrics']:
+        task1_code1.plot_metrics_over_time(cube, metric, metric)
+    task1_code1.analyze_performance(cube)
+    task1_code2.plot_performance_mirror(cube)
+    task1_code2.plot_task_distribution(experimental)
+    task1_code2.plot_task_trends(cube)
+
+
+def _render_task2(cube, rows):
+    import task2_code1
+    import task2_code2
+    task2_code1.create_radar_chart(cube)
+    task2_code1.create_3d_scatter(rows)
+    task2_code1.create_sunburst(cube)
+    task2_code1.create_parallel_coordinates(rows)
+    task2_code2.create_interactive_performance_dashboard(cube)
+
+
+def _render_task3(data):
+    import task3_code2
+    task3_code2.analyze_overall_salary_growth(data)
+    task3_code2.analyze_department_salary(data)
+    task3_code2.analyze_position_salary(data)
+    task3_code2.analyze_salary_distribution(data)
+
+
+def bench_task1():
+    """task1：加载 → 聚合立方体 → 汇总表和实验组/对照组差异 → matplotlib 图"""
+    from aggregate_cube import build_cube, cube_stats
+    from cohort_loader import load_cohort_data
+    from task1_code2 import experimental_control_difference
+
+    df, *load = measure(lambda: load_cohort_data(use_cache=False))
+    yield 'load', load
+    cube, *aggregate = measure(build_cube, df)
+    yield 'aggregate', aggregate
+    _, *stats = measure(lambda: (cube_stats(cube, ['Group_Type', 'Gender']), experimental_control_difference(cube)))
+    yield 'stats', stats
+    experimental = df.loc[df['Group_Type'] == 'Experimental', ['Group_Type', 'Year', 'Gender'] + cube.attrs['metrics']]
+    _, *render = measure(_render_task1, cube, experimental)
+    yield 'render', render
+
+
+def bench_task2():
+    """task2：加载 → 聚合立方体 → 绩效占比 → Plotly 交互图"""
+    from aggregate_cube import build_cube
+    from cohort_loader import load_cohort_data
+    from task2_code2 import performance_shares
+
+    df, *load = measure(lambda: load_cohort_data(use_cache=False))
+    yield 'load', load
+    cube, *aggregate = measure(build_cube, df)
+    yield 'aggregate', aggregate
+    _, *stats = measure(performance_shares, cube, ['Gender', 'Group_Type', 'Year'])
+    yield 'stats', stats
+    rows = df[['Group_Type', 'Gender', 'Year', 'Department'] + cube.attrs['metrics']]
+    _, *render = measure(_render_task2, cube, rows)
+    yield 'render', render
+
+
+def bench_task3():
+    """task3：加载 → 按年份/性别/职位聚合 → 增长率 → matplotlib 图"""
+    import task3_code2
+    # 这里直接调用各分析函数而不经过 main，需要自己创建输出目录
+    task3_code2.output_dir.mkdir(exist_ok=True)
+
+    data, *load = measure(lambda: task3_code2.load_data())
+    yield 'load', load
+    _, *aggregate = measure(lambda: data.groupby(['Year', 'Gender', 'Position'], observed=True)['Starting_Salary'].agg(['mean', 'count']))
+    yield 'aggregate', aggregate
+    _, *stats = measure(task3_code2.calculate_growth_rates, data)
+    yield 'stats', stats
+    _, *render = measure(_render_task3, data)
+    yield 'render', render
+
+
+def bench_task4():
+    """task4：解析预测文本（load）→ 配对矩阵（aggregate）→ 配对检验（stats）"""
+    from paired_stats import compare_matrices, load_matrix
+    from prediction_parser import iter_employees, iter_lines, iter_salary_records, salary_row
+
+    def parse():
+        return [salary_row(records)
+                for _, records in iter_employees(iter_salary_records(iter_lines('男_predictions_year_salary.csv')))]
+
+    _, *load = measure(parse)
+    yield 'load', load
+    (male, female), *aggregate = measure(lambda: (load_matrix('male_salary.csv'), load_matrix('female_salary.csv')))
+    yield 'aggregate', aggregate
+    _, *stats = measure(compare_matrices, male, female)
+    yield 'stats', stats
+
+
+BENCHMARKS = {
+    'task1': ('tasks', bench_task1),
+    'task2': ('tasks', bench_task2),
+    'task3': ('salary', bench_task3),
+    'task4': ('predictions', bench_task4),
+}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, tasks=TASKS, stages=STAGES, workdir=None, seed=0):
+    """
+    对每个规模生成合成数据，并在数据目录中依次运行各任务的各个阶段
+    （后面的阶段依赖前面阶段的结果，所以只会跳过最后一个所选阶段之后的阶段）。
+    返回结果记录列表：{task, stage, rows, wall_s, cpu_s, peak_mb}。
+    """
+    last_stage = max(STAGES.index(stage) for stage in stages)
+    import matplotlib
+    matplotlib.use('Agg')
+
+    root = workdir or tempfile.mkdtemp(prefix="cohort_bench_")
+    cwd = os.getcwd()
+    results = []
+    try:
+        for rows in sizes:
+            for task in tasks:
+                kind, bench = BENCHMARKS[task]
+                data_dir = os.path.join(root, f"{kind}_{rows}")
+                if not os.path.isdir(data_dir):
+                    write_cohorts(data_dir, rows, kind=kind, seed=seed)
+                os.chdir(data_dir)
+                try:
+                    for stage, (wall, cpu, peak) in bench():
+                        if stage in stages:
+                            results.append({'task': task, 'stage': stage, 'rows': rows, 'wall_s': round(wall, 4),
+                                            'cpu_s': round(cpu, 4), 'peak_mb': round(peak, 2)})
+                            print(f"{task:<6} {stage:<10} {rows:>10,} rows  {wall:8.3f}s wall  "
+                                  f"{cpu:8.3f}s cpu  {peak:9.1f} MB peak")
+                        # 不再取下一个阶段，生成器就不会执行它
+                        if STAGES.index(stage) >= last_stage:
+                            break
+                finally:
+                    os.chdir(cwd)
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def environment_info():
+    return {
+        'memory': 'peak RSS delta' if reset_peak_rss() else 'tracemalloc peak',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def save_results(results, path=RESULTS_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile each analysis stage on synthetic cohorts.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="total rows per cohort")
+    parser.add_argument('--tasks', nargs='+', choices=TASKS, default=list(TASKS))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--workdir', help="keep generated data (and rendered figures) in this directory")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.tasks, args.stages, args.workdir, args.seed)
+    save_results(results, args.output)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import TASK_METRICS
+from profiling import profiled
+
+# 去重后的不同取值不超过该数时按多项分布抽样，否则退回到逐行的索引矩阵
+MAX_DISTINCT_VALUES = 4096
+# 索引矩阵模式下每个小批次最多展开的元素个数（控制内存）
+MAX_BATCH_ELEMENTS = 2 ** 24
+DEFAULT_BATCH_SIZE = 2000
+
+_NORMAL = NormalDist()
+
+
+def compress_sample(values):
+    """
+    把一维样本压缩为 (不同取值, 出现次数)。
+    任务数这类小整数指标只有几种取值，此时重抽样只需要对计数做多项分布抽样，
+    与逐行抽样的分布完全相同，但成本与 n 无关。取值太多时保留原始值，weights 为 None。
+    """
+    values = np.asarray(values, dtype=float)
+    uniq, counts = np.unique(values, return_counts=True)
+    if len(uniq) <= MAX_DISTINCT_VALUES:
+        return uniq, counts
+    return values, None
+
+
+def resample_means(values, weights, size, rng):
+    """从一个（压缩后的）样本中有放回重抽样 size 次，返回每次的均值 (size,)"""
+    if weights is not None:
+        n = weights.sum()
+        counts = rng.multinomial(n, weights / n, size=size)
+        return counts @ values / n
+
+    # 一次生成整个索引矩阵；超过内存上限时按块生成
+    n = len(values)
+    rows = max(MAX_BATCH_ELEMENTS // n, 1)
+    means = np.empty(size)
+    for start in range(0, size, rows):
+        stop = min(start + rows, size)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = values[idx].mean(axis=1)
+    return means
+
+
+def _resample_batch(cells, size, seed):
+    """一个批次：对每个（单元格, 指标）的男女样本分别重抽样，返回差值 (size, 单元格数)"""
+    rng = np.random.default_rng(seed)
+    gaps = np.empty((size, len(cells)))
+    for j, (male, female) in enumerate(cells):
+        gaps[:, j] = resample_means(*male, size, rng) - resample_means(*female, size, rng)
+    return gaps
+
+
+def _weighted_mean(values, weights):
+    weights = np.ones(len(values)) if weights is None else weights
+    return weights @ values / weights.sum(), weights
+
+
+def jackknife_acceleration(male, female):
+    """
+    BCa 的加速常数：对两组合并做留一法。均值的留一估计有解析式
+    (S - x_i) / (n - 1)，所以不需要真的计算 n 次，压缩样本按出现次数加权。
+    """
+    (m_values, m_weights), (f_values, f_weights) = male, female
+    m_mean, m_weights = _weighted_mean(m_values, m_weights)
+    f_mean, f_weights = _weighted_mean(f_values, f_weights)
+    n_m, n_f = m_weights.sum(), f_weights.sum()
+
+    # 去掉一名男性 / 女性后的差值
+    theta = np.concatenate([
+        (m_mean * n_m - m_values) / (n_m - 1) - f_mean,
+        m_mean - (f_mean * n_f - f_values) / (n_f - 1),
+    ])
+    weights = np.concatenate([m_weights, f_weights])
+    u = weights @ theta / weights.sum() - theta
+    den = 6 * (weights @ u ** 2) ** 1.5
+    return (weights @ u ** 3) / den if den > 0 else 0.0
+
+
+def _column_quantiles(sorted_boot, q):
+    """每一列取各自的分位数 q（sorted_boot 已按列排序，线性插值）"""
+    B = sorted_boot.shape[0]
+    pos = np.clip(q, 0, 1) * (B - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, B - 1)
+    frac = pos - lo
+    cols = np.arange(sorted_boot.shape[1])
+    return sorted_boot[lo, cols] * (1 - frac) + sorted_boot[hi, cols] * frac
+
+
+def confidence_intervals(boot, estimate, ci=0.95, method='bca', acceleration=None):
+    """
+    由重抽样结果 boot (B, k) 计算每列的置信区间，返回 (下限, 上限)。
+    method='percentile' 直接取分位数；method='bca' 做偏差和偏度校正。
+    """
+    alpha = (1 - ci) / 2
+    sorted_boot = np.sort(boot, axis=0)
+    if method == 'percentile':
+        return _column_quantiles(sorted_boot, np.full(boot.shape[1], alpha)), \
+            _column_quantiles(sorted_boot, np.full(boot.shape[1], 1 - alpha))
+    if method != 'bca':
+        raise ValueError(f"Unknown interval method: {method}")
+
+    # 偏差校正 z0：重抽样估计低于原估计的比例（并列算一半）
+    below = (boot < estimate).mean(axis=0) + 0.5 * (boot == estimate).mean(axis=0)
+    below = np.clip(below, 1 / (2 * len(boot)), 1 - 1 / (2 * len(boot)))
+    z0 = np.array([_NORMAL.inv_cdf(p) for p in below])
+    a = np.zeros_like(z0) if acceleration is None else np.nan_to_num(acceleration)
+
+    bounds = []
+    for level in (alpha, 1 - alpha):
+        z = z0 + _NORMAL.inv_cdf(level)
+        adjusted = np.array([_NORMAL.cdf(v) for v in z0 + z / (1 - a * z)])
+        bounds.append(_column_quantiles(sorted_boot, adjusted))
+    return tuple(bounds)
+
+
+@profiled(category='stats')
+def bootstrap_gender_gaps(df, metrics=TASK_METRICS, by=('Group_Type', 'Year'), n_resamples=10000, ci=0.95,
+                          method='bca', batch_size=DEFAULT_BATCH_SIZE, workers=1, seed=0):
+    """
+    对 by 的每个单元格和每个指标，计算男性均值减女性均值的差距及其 bootstrap 置信区间。
+    男女两组分别有放回重抽样（分层 bootstrap）。每个区间只依赖该指标的边缘分布，
+    所以各指标单独压缩和重抽样（缺失值只在对应指标中剔除）。
+    重抽样按 batch_size 分批生成以限制内存，workers > 1 时各批次在进程池中并行，
+    workers=None 表示使用全部CPU核心。结果只由 seed 决定，与 workers 无关。
+
+    返回以 (by..., metric) 为索引的数据框：gap, ci_low, ci_high, se, n_male, n_female。
+    """
+    metrics, by = list(metrics), list(by)
+    groups = {key: part for key, part in df[by + ['Gender'] + metrics].groupby(by + ['Gender'], observed=True)}
+
+    keys, cells = [], []
+    for key in sorted({k[:-1] for k in groups}):
+        male, female = groups.get(key + ('Male',)), groups.get(key + ('Female',))
+        if male is None or female is None:
+            continue
+        for metric in metrics:
+            m_values, f_values = male[metric].dropna(), female[metric].dropna()
+            if len(m_values) < 2 or len(f_values) < 2:
+                continue
+            keys.append(key + (metric,))
+            cells.append((compress_sample(m_values), compress_sample(f_values)))
+    if not cells:
+        raise ValueError("No cell has at least two male and two female employees")
+
+    estimate = np.array([_weighted_mean(*male)[0] - _weighted_mean(*female)[0] for male, female in cells])
+
+    sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as executor:
+            batches = list(executor.map(_resample_batch, [cells] * len(sizes), sizes, seeds))
+    else:
+        batches = [_resample_batch(cells, size, s) for size, s in zip(sizes, seeds)]
+    boot = np.concatenate(batches)
+
+    acceleration = None
+    if method == 'bca':
+        acceleration = np.array([jackknife_acceleration(male, female) for male, female in cells])
+    low, high = confidence_intervals(boot, estimate, ci, method, acceleration)
+
+    counts = np.array([[_weighted_mean(*male)[1].sum(), _weighted_mean(*female)[1].sum()]
+                       for male, female in cells]).astype(int)
+    return pd.DataFrame({
+        'gap': estimate,
+        'ci_low': low,
+        'ci_high': high,
+        'se': boot.std(axis=0, ddof=1),
+        'n_male': counts[:, 0],
+        'n_female': counts[:, 1],
+    }, index=pd.MultiIndex.from_tuples(keys, names=by + ['metric']))
@@ -0,0 +1,117 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pipeline import code_files, file_digest
+
+MANIFEST_PATH = ".figure_manifest.json"
+
+
+def _hash_pandas(h, obj):
+    # 索引单独哈希（聚合立方体的 MultiIndex 可能含 NaN，不能直接交给 hash_pandas_object）
+    h.update(pd.util.hash_pandas_object(obj.index.to_frame(index=False), index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+
+
+def _update_hash(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr((list(obj.columns), list(obj.dtypes))).encode('utf-8'))
+        _hash_pandas(h, obj)
+    elif isinstance(obj, pd.Series):
+        h.update(repr((obj.name, obj.dtype)).encode('utf-8'))
+        _hash_pandas(h, obj)
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        # repr 会把大数组截断成 "..."，必须哈希完整内容
+        h.update(repr((obj.dtype.str, obj.shape)).encode('utf-8'))
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}:{len(obj)}".encode('utf-8'))
+        for item in obj:
+            _update_hash(h, item)
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            h.update(repr(key).encode('utf-8'))
+            _update_hash(h, obj[key])
+    else:
+        h.update(repr(obj).encode('utf-8'))
+
+
+@functools.lru_cache(maxsize=None)
+def _code_digest(module_name):
+    """模块及其导入的本地模块（pipeline.code_files）的源文件哈希，与流水线阶段的指纹使用同一套规则"""
+    if module_name == '__main__':
+        # 直接运行的脚本：按文件名找到同一个源文件
+        path = getattr(sys.modules['__main__'], '__file__', None)
+        if not path:
+            return ''
+        module_name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        files = code_files(module_name)
+    except (ImportError, ValueError, SyntaxError):
+        return ''
+    return hashlib.sha256(''.join(file_digest(path) for path in files).encode('utf-8')).hexdigest()
+
+
+def fingerprint(func, args):
+    """
+    图表的指纹：绘图函数的源代码、它所在模块及其导入的本地模块的源文件，加上全部输入数据的哈希。
+    模块级的绘图设置（如 plt.rcParams）和被调用的辅助函数也包含在内，
+    数据或任何相关代码变化都会得到不同的指纹。
+    """
+    h = hashlib.sha256()
+    h.update(f"{func.__module__}.{func.__qualname__}".encode('utf-8'))
+    try:
+        h.update(inspect.getsource(func).encode('utf-8'))
+    except (OSError, TypeError):
+        pass
+    h.update(_code_digest(func.__module__).encode('utf-8'))
+    _update_hash(h, args)
+    return h.hexdigest()
+
+
+class BuildManifest:
+    """
+    记录每个产物（PNG / HTML）对应的输入指纹。
+    指纹未变且文件仍然存在的产物在下次运行时跳过。
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        self.rebuilt = []
+        self.skipped = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def is_current(self, artifact, fp):
+        return self.entries.get(artifact) == fp and os.path.exists(artifact)
+
+    def skip(self, artifact):
+        self.skipped.append(artifact)
+
+    def record(self, artifact, fp):
+        self.entries[artifact] = fp
+        self.rebuilt.append(artifact)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def print_summary(self):
+        print(f"\nArtifacts: {len(self.rebuilt)} rebuilt, {len(self.skipped)} skipped (unchanged)")
+        for artifact in self.rebuilt:
+            print(f"  rebuilt  {artifact}")
+        for artifact in self.skipped:
+            print(f"  skipped  {artifact}")
@@ -0,0 +1,258 @@
+import glob
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from cohort_schema import SCHEMA_VERSION, apply_schema, concat_categoricals
+from profiling import collect, merge, profiled, stage
+
+# 缓存目录（相对于数据所在的当前工作目录）
+CACHE_DIR = ".cohort_cache"
+MANIFEST_FILE = "manifest.json"
+
+YEAR_PATTERN = re.compile(r'第(\d+)年')
+# 流式读取时每块的行数
+STREAM_CHUNK_ROWS = 1_000_000
+
+
+def parse_cohort_filename(file):
+    """从文件名提取 Group_Type / Gender / Year"""
+    name = os.path.basename(file)
+    if "对照组" in name:
+        group_type = "Control"
+        gender = "Male" if "S_" in name else "Female"
+    else:
+        group_type = "Experimental"
+        gender = "Male" if "男" in name else "Female"
+
+    match = YEAR_PATTERN.search(name)
+    if match is None:
+        raise ValueError(f"Cannot find year in file name: {name}")
+    return group_type, gender, int(match.group(1))
+
+
+@profiled(category='load')
+def read_cohort_file(file):
+    """读取单个CSV文件，添加 Year / Group_Type / Gender 列并转换为声明的紧凑类型"""
+    df = pd.read_csv(file, encoding='utf-8')
+    group_type, gender, year = parse_cohort_filename(file)
+    df['Year'] = year
+    df['Group_Type'] = group_type
+    df['Gender'] = gender
+    return apply_schema(df)
+
+
+def iter_cohort_chunks(files=None, pattern="*.csv", chunksize=STREAM_CHUNK_ROWS, columns=None):
+    """
+    逐块读取队列CSV文件（不经过缓存，也不拼接），每块和 read_cohort_file 一样添加
+    Year / Group_Type / Gender 列并转换为紧凑类型。columns 给出时只读取这些源列。
+    """
+    if files is None:
+        files = sorted(glob.glob(pattern))
+    if not files:
+        raise ValueError("No CSV files found in the current directory!")
+
+    for file in files:
+        group_type, gender, year = parse_cohort_filename(file)
+        usecols = None if columns is None else (lambda col: col in columns)
+        for chunk in pd.read_csv(file, encoding='utf-8', chunksize=chunksize, usecols=usecols):
+            chunk['Year'] = year
+            chunk['Group_Type'] = group_type
+            chunk['Gender'] = gender
+            yield apply_schema(chunk)
+
+
+def _cache_format():
+    """有 pyarrow 时使用 Parquet，否则退回到 pickle"""
+    try:
+        import pyarrow  # noqa: F401
+        return "parquet"
+    except ImportError:
+        return "pickle"
+
+
+def _file_signature(file):
+    stat = os.stat(file)
+    return {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _load_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_cache(path, fmt):
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def _write_cache(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_pickle(path)
+
+
+def load_cached_file(file, cache_dir, manifest, fmt):
+    """
+    读取单个文件：签名（mtime + size）未变化时直接读缓存，否则重新解析CSV并写入缓存。
+    返回 (df, 新的清单条目, 是否命中缓存)。清单本身不在这里修改，便于在子进程中调用。
+    """
+    key = os.path.abspath(file)
+    signature = _file_signature(file)
+    entry = manifest.get(key)
+
+    if (entry and entry.get('signature') == signature and entry.get('format') == fmt
+            and entry.get('schema') == SCHEMA_VERSION):
+        cache_path = os.path.join(cache_dir, entry['cache'])
+        if os.path.exists(cache_path):
+            try:
+                with stage('read_cache', 'load') as current:
+                    df = _read_cache(cache_path, fmt)
+                    current.rows = len(df)
+                return df, entry, True
+            except Exception:
+                pass
+
+    df = read_cohort_file(file)
+    cache_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + "." + fmt
+    with stage('write_cache', 'load', len(df)):
+        _write_cache(df, os.path.join(cache_dir, cache_name), fmt)
+    return df, {'signature': signature, 'format': fmt, 'schema': SCHEMA_VERSION, 'cache': cache_name}, False
+
+
+def _load_one(file, cache_dir, manifest, fmt, use_cache):
+    """单个文件的加载任务（顺序模式和进程池共用）"""
+    try:
+        if use_cache:
+            df, entry, hit = load_cached_file(file, cache_dir, manifest, fmt)
+        else:
+            df, entry, hit = read_cohort_file(file), None, False
+        return file, df, entry, hit, None
+    except Exception as e:
+        return file, None, None, False, str(e)
+
+
+def _load_in_worker(*args):
+    """进程池中的加载任务：连同子进程里记录的 profiling 阶段一起返回"""
+    with collect() as stages:
+        result = _load_one(*args)
+    return result, stages
+
+
+def assemble_frames(frames):
+    """
+    按列拼接各分片。数值列预先分配结果数组后逐片填入，category 列合并类别后只拼接编码，
+    每拼完一列就释放分片中的这一列，因此峰值内存只比结果多一列，而不是整表的额外拷贝。
+    最后再按模式检查一次（各分片的整型宽度可能不同）。
+    """
+    columns = list(frames[0].columns)
+    if any(list(f.columns) != columns for f in frames[1:]):
+        return apply_schema(pd.concat(frames, ignore_index=True))
+
+    total = sum(len(f) for f in frames)
+    out = {}
+    for col in columns:
+        parts = [f.pop(col) for f in frames]
+        dtypes = {part.dtype for part in parts}
+        if all(isinstance(dtype, np.dtype) and dtype.kind in 'biuf' for dtype in dtypes):
+            values = np.empty(total, dtype=np.result_type(*dtypes))
+            offset = 0
+            for part in parts:
+                values[offset:offset + len(part)] = part.to_numpy()
+                offset += len(part)
+            out[col] = values
+        elif all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            out[col] = concat_categoricals(parts)
+        else:
+            out[col] = pd.concat(parts, ignore_index=True)
+        del parts
+    return apply_schema(pd.DataFrame(out, copy=False))
+
+
+@profiled(category='load')
+def load_cohort_data(files=None, pattern="*.csv", cache_dir=CACHE_DIR, use_cache=True, verbose=False,
+                     workers=1):
+    """
+    加载所有队列CSV文件并合并为一个数据框。
+
+    每个源文件单独缓存，并按 mtime 和 size 判断是否失效，
+    因此某一年的文件变化只会重新解析这一个文件。
+    workers > 1 时用进程池并行解析文件，workers=None 表示使用全部CPU核心。
+    """
+    if files is None:
+        files = sorted(glob.glob(pattern))
+    if verbose:
+        print(f"Found {len(files)} CSV files:")
+        for file in files:
+            print(f"- {file}")
+
+    if not files:
+        raise ValueError("No CSV files found in the current directory!")
+
+    fmt = _cache_format()
+    manifest = {}
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest = _load_manifest(cache_dir)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(files))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = []
+            for result, stages in executor.map(
+                _load_in_worker, files,
+                repeat(cache_dir), repeat(manifest), repeat(fmt), repeat(use_cache)
+            ):
+                merge(stages)
+                results.append(result)
+    else:
+        results = (_load_one(file, cache_dir, manifest, fmt, use_cache) for file in files)
+
+    all_data = []
+    hits = 0
+    for file, df, entry, hit, error in results:
+        if error is not None:
+            print(f"Error processing file {file}: {error}")
+            continue
+        if verbose:
+            print(f"- {file}: {len(df)} rows")
+        if entry is not None:
+            manifest[os.path.abspath(file)] = entry
+        hits += hit
+        all_data.append(df)
+
+    if use_cache:
+        _save_manifest(cache_dir, manifest)
+        if verbose:
+            print(f"Cache: {hits} hit(s), {len(all_data) - hits} rebuilt")
+
+    if not all_data:
+        raise ValueError("No data was successfully loaded from the CSV files!")
+
+    with stage('assemble_frames', 'load', sum(len(df) for df in all_data)):
+        return assemble_frames(all_data)
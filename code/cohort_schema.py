@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# 员工数据的列类型声明：字符串列用 category（按字典序排列的类别），整数列用够用的最窄整型
+COHORT_SCHEMA = {
+    'Name': 'category',
+    'Gender': 'category',
+    'Group_Type': 'category',
+    'Department': 'category',
+    'Performance': 'category',
+    'Age': 'int8',
+    'Position': 'int8',
+    'Year': 'int8',
+    'Low_Value_Tasks': 'int8',
+    'High_Value_Tasks': 'int8',
+    'Leadership_Tasks': 'int8',
+    'Starting_Salary': 'int32',
+}
+
+# 模式变化时递增，让旧的解析缓存失效
+SCHEMA_VERSION = 1
+
+
+def to_category(series):
+    """转换为以字符串为类别的 category（混合了数字和字符串的列统一成字符串）"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if series.cat.categories.inferred_type == 'string':
+            return series
+        series = series.astype(object)
+    values = series.map(str, na_action='ignore') if series.dtype == object else series.astype('str')
+    values = values.where(series.notna())
+    return values.astype('category')
+
+
+def to_integer(series, dtype):
+    """
+    转换为声明的整型。值超出范围时换用能容纳的更宽整型；
+    含缺失值或非整数值时不能无损转换，保留为 float64。
+    """
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iu':
+        values = series.to_numpy()
+    else:
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+        if np.isnan(values).any() or (values % 1 != 0).any():
+            return series.astype(float)
+    if not len(values):
+        return series.astype(dtype)
+    lo, hi = values.min(), values.max()
+    for candidate in (dtype, 'int16', 'int32', 'int64'):
+        info = np.iinfo(candidate)
+        if np.dtype(candidate).itemsize >= np.dtype(dtype).itemsize and info.min <= lo and hi <= info.max:
+            return series.astype(candidate)
+    return series.astype('int64')
+
+
+def apply_schema(df, schema=COHORT_SCHEMA):
+    """按声明把 df 中存在的列就地转换为紧凑类型，返回 df"""
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'category':
+            df[col] = to_category(df[col])
+        else:
+            df[col] = to_integer(df[col], dtype)
+    return df
+
+
+def concat_categoricals(parts):
+    """合并多个 category 分片，类别取并集并按字典序排列"""
+    return pd.Series(union_categoricals(parts, sort_categories=True))
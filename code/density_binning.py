@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# 行数超过该值时交互图改用分箱/抽样数据，HTML 大小与队列规模无关
+LARGE_N_THRESHOLD = 50000
+# 3D 散点每个坐标轴的分箱数（每个 trace 最多 SCATTER_BINS ** 3 个点）
+SCATTER_BINS = 20
+# 平行坐标图在大数据模式下最多保留的行数
+PARCOORDS_MAX_ROWS = 20000
+
+
+def axis_ranges(values):
+    """每一列的 (最小值, 最大值)，常数列向外扩一点避免零宽度的箱"""
+    lo = np.nanmin(values, axis=0).astype(float)
+    hi = np.nanmax(values, axis=0).astype(float)
+    hi = np.where(hi > lo, hi, lo + 1.0)
+    return list(zip(lo, hi))
+
+
+def bin_points(values, bins=SCATTER_BINS, ranges=None):
+    """
+    用 NumPy 多维直方图把 (n, d) 的点分箱。
+    返回非空箱中点的均值坐标 (k, d) 和每个箱的点数 (k,)。
+    用均值而不是箱中心作为坐标，取值离散时点的位置与原始数据完全一致。
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values).any(axis=1)]
+    if ranges is None:
+        ranges = axis_ranges(values)
+    counts, _ = np.histogramdd(values, bins=bins, range=ranges)
+    occupied = counts > 0
+    n = counts[occupied]
+    means = np.empty((len(n), values.shape[1]))
+    for j in range(values.shape[1]):
+        sums, _ = np.histogramdd(values, bins=bins, range=ranges, weights=values[:, j])
+        means[:, j] = sums[occupied] / n
+    return means, n.astype(np.int64)
+
+
+def density_marker_sizes(counts, min_size=3, max_size=18, max_count=None):
+    """按点数的平方根把箱映射为标记大小（面积与点数大致成正比）"""
+    counts = np.asarray(counts, dtype=float)
+    if max_count is None:
+        max_count = counts.max() if len(counts) else 1
+    scale = np.sqrt(counts / max(max_count, 1))
+    return min_size + (max_size - min_size) * scale
+
+
+def stratified_sample(df, by, max_rows, seed=0):
+    """
+    每个分层（by 的取值组合）等额随机抽样，总行数不超过 max_rows。
+    小于配额的分层全部保留。用随机键在组内排名，不需要逐组 apply。
+    """
+    if len(df) <= max_rows:
+        return df
+    n_groups = df.groupby(by, observed=True).ngroups
+    quota = max(max_rows // max(n_groups, 1), 1)
+    rng = np.random.default_rng(seed)
+    keys = pd.Series(rng.random(len(df)), index=df.index)
+    rank = keys.groupby([df[col] for col in by], observed=True).rank(method='first')
+    return df[rank <= quota]
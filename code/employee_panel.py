@@ -0,0 +1,127 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+PANEL_FIELDS = ('Position', 'Starting_Salary', 'Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks')
+ID_COLUMNS = ('Group_Type', 'Gender', 'Name')
+ATTRIBUTE_COLUMNS = ('Name', 'Gender', 'Group_Type', 'Department')
+
+
+class EmployeePanel(NamedTuple):
+    """
+    按员工对齐的纵向面板。
+    employees: 每个员工一行的属性（取该员工最早一年的记录）
+    years: 排好序的年份数组
+    fields: {字段名: (员工数, 年份数) 的 float 数组}，缺失的年份为 NaN
+    """
+    employees: pd.DataFrame
+    years: np.ndarray
+    fields: dict
+
+
+@profiled(category='aggregate')
+def build_panel(df, fields=PANEL_FIELDS, id_columns=ID_COLUMNS):
+    """
+    把逐年堆叠的数据按员工身份连接成稠密面板。
+    身份由 id_columns 决定；同一年里重名的员工按出现顺序编号（第几个同名者），
+    因此各年份文件行顺序一致时重名员工也能正确对齐。
+    """
+    id_columns = [col for col in id_columns if col in df.columns]
+    fields = [field for field in fields if field in df.columns]
+
+    occurrence = df.groupby(id_columns + ['Year'], observed=True, sort=False).cumcount()
+    keys = [df[col] for col in id_columns] + [occurrence.rename('_occurrence')]
+    employee = pd.MultiIndex.from_arrays(keys).factorize()[0] if len(df) else np.array([], dtype=int)
+    years = np.sort(df['Year'].unique()).astype(int)
+    year = np.searchsorted(years, df['Year'].to_numpy())
+    n_employees = employee.max() + 1 if len(employee) else 0
+
+    arrays = {}
+    for field in fields:
+        values = np.full((n_employees, len(years)), np.nan)
+        values[employee, year] = df[field].to_numpy(dtype=float)
+        arrays[field] = values
+
+    # 每个员工的属性取最早一年的记录
+    first = np.lexsort((year, employee))
+    first = first[np.r_[True, employee[first][1:] != employee[first][:-1]]]
+    attributes = [col for col in ATTRIBUTE_COLUMNS if col in df.columns]
+    employees = df.iloc[first][attributes].reset_index(drop=True)
+    return EmployeePanel(employees, years, arrays)
+
+
+def _year_index(panel, year, default):
+    if year is None:
+        return default
+    matches = np.flatnonzero(panel.years == year)
+    if not len(matches):
+        raise ValueError(f"Year {year} is not in the panel (years: {list(panel.years)})")
+    return matches[0]
+
+
+def total_growth(panel, field='Starting_Salary', start=None, end=None):
+    """每个员工从 start 年到 end 年（默认第一年到最后一年）的总增长率"""
+    values = panel.fields[field]
+    i, j = _year_index(panel, start, 0), _year_index(panel, end, len(panel.years) - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values[:, j] / values[:, i] - 1
+
+
+def cagr(panel, field='Starting_Salary', start=None, end=None):
+    """每个员工的年均复合增长率，指数取实际的年数跨度（而不是固定的区间数）"""
+    i, j = _year_index(panel, start, 0), _year_index(panel, end, len(panel.years) - 1)
+    span = panel.years[j] - panel.years[i]
+    if span <= 0:
+        raise ValueError("CAGR needs an end year after the start year")
+    with np.errstate(invalid='ignore'):
+        return (1 + total_growth(panel, field, start, end)) ** (1 / span) - 1
+
+
+def interval_growth(panel, field='Starting_Salary', annualize=True):
+    """
+    每个员工在相邻两个观测年份之间的增长率 (员工数, 年份数 - 1)。
+    annualize=True 时按两年份之间的实际年数折算为年增长率，年份间隔不均匀时也可比较。
+    """
+    values = panel.fields[field]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = values[:, 1:] / values[:, :-1]
+        if annualize:
+            return ratio ** (1 / np.diff(panel.years)) - 1
+        return ratio - 1
+
+
+def first_promotion_year(panel, field='Position'):
+    """
+    每个员工第一次职位高于起始职位的年份（相对该员工第一次出现的年数），从未晋升为 NaN。
+    起始职位取每个员工第一个非 NaN 的观测，中途入职的员工也按自己的起点计算。
+    """
+    values = panel.fields[field]
+    observed = ~np.isnan(values)
+    start = observed.argmax(axis=1)
+    rows = np.arange(len(values))
+    promoted = values > values[rows, start][:, None]
+    has_promotion = promoted.any(axis=1)
+    first = promoted.argmax(axis=1)
+    return np.where(has_promotion, panel.years[first] - panel.years[start], np.nan)
+
+
+def group_mask(panel, column, value):
+    return (panel.employees[column] == value).to_numpy()
+
+
+def gap_over_time(panel, field, column='Gender', a='Male', b='Female', reducer=np.nanmean):
+    """每一年 a 组与 b 组（默认男减女）在 field 上的差距，按年份索引"""
+    values = panel.fields[field]
+    with np.errstate(invalid='ignore'):
+        gap = reducer(values[group_mask(panel, column, a)], axis=0) - \
+            reducer(values[group_mask(panel, column, b)], axis=0)
+    return pd.Series(gap, index=pd.Index(panel.years, name='Year'), name=f'{field} gap ({a} - {b})')
+
+
+def summarize_by_group(panel, per_employee, column='Gender', reducers=('mean', 'median')):
+    """把每个员工一个值的数组按组汇总（忽略 NaN）"""
+    frame = pd.DataFrame({'value': per_employee, column: panel.employees[column].to_numpy()})
+    return frame.groupby(column, observed=True)['value'].agg(list(reducers))
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = "llm_response_cache.sqlite"
+
+
+def make_cache_key(model, messages, temperature, max_tokens, sample_index=0):
+    """对 (model, messages, temperature, max_tokens, sample_index) 做内容哈希"""
+    payload = json.dumps(
+        [model, messages, temperature, max_tokens, sample_index],
+        ensure_ascii=False, sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的 LLM 回复缓存。
+
+    max_age 秒之前写入的条目视为过期；条目数或总字节数超出 max_entries / max_bytes 时
+    按最近访问时间淘汰最旧的条目。hits / misses 记录本次运行的命中情况。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=None, max_bytes=None, max_age=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   response TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   created REAL NOT NULL,
+                   accessed REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """返回缓存的回复，未命中或已过期时返回 None"""
+        row = self._conn.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (self.max_age is not None and now - row[1] > self.max_age):
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, response, len(response.encode('utf-8')), now, now)
+        )
+        self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        """按年龄、条目数和总大小淘汰条目，返回删除的条目数"""
+        removed = 0
+        if self.max_age is not None:
+            cur = self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+            removed += cur.rowcount
+        if self.max_entries is not None:
+            cur = self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                       SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entries,)
+            )
+            removed += cur.rowcount
+        if self.max_bytes is not None:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed ASC"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total -= size
+                    removed += 1
+        self._conn.commit()
+        return removed
+
+    def stats(self):
+        entries, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': total}
+
+    def close(self):
+        self._conn.close()
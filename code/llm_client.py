@@ -0,0 +1,289 @@
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+from llm_cache import make_cache_key
+
+# 默认使用 OpenAI 接口，可以通过 OPENAI_API_BASE 指向本地的模拟服务
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+# 这些状态码是暂时性的（限流 / 服务端过载），退避后重试
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def estimate_tokens(messages, max_tokens=0):
+    """
+    粗略估计一次请求消耗的 token 数（中文约每字 1 个 token），
+    加上为回复预留的 max_tokens，用于在发送前向令牌桶申请额度。
+    """
+    prompt_chars = sum(len(m['content']) for m in messages)
+    return prompt_chars + max_tokens
+
+
+class TokenBucket:
+    """
+    异步令牌桶：按每分钟 rate_per_minute 的速度补充，最多积累 capacity 个令牌。
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """等待直到桶中有 amount 个令牌并取走（超过容量的请求按容量计）"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        """请求完成后按实际用量修正（delta 为负表示退还多扣的令牌）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """同时限制每分钟请求数（RPM）和每分钟 token 数（TPM）"""
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=300000):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, estimated_tokens):
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+
+    def settle(self, estimated_tokens, used_tokens):
+        if self.tokens is not None and used_tokens is not None:
+            self.tokens.adjust(used_tokens - estimated_tokens)
+
+
+class TransientError(Exception):
+    """可以重试的失败（429 / 5xx / 连接错误 / 超时）；retry_after 为服务端要求的等待秒数"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Retry-After 头：秒数或 HTTP 日期，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, retry_after=None):
+    """
+    第 attempt 次重试前的等待时间：full jitter 指数退避，在 [0, min(cap, base * 2^attempt)] 内均匀抽取，
+    避免大量并发请求同时重试；服务端给了 Retry-After 时至少等待这么久。
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class CircuitBreaker:
+    """
+    断路器：连续 failure_threshold 次暂时性失败后打开，所有请求暂停 cooldown 秒（整个运行暂停，
+    而不是让每个请求各自把重试次数耗尽）。冷却结束后只放行一个探测请求：
+    成功则关闭断路器，失败则重新打开并把冷却时间加倍（不超过 max_cooldown）。
+    """
+
+    def __init__(self, failure_threshold=10, cooldown=5.0, max_cooldown=120.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.trips = 0
+        self._cooldown = cooldown
+        self._opened_until = 0.0
+        self._probing = False
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """
+        断路器关闭时立即返回 False；打开时等待冷却结束。半开时只放行一个探测请求（返回 True），
+        探测请求没有结果就中止时（例如被取消）调用 release_probe 让其他请求接替探测。
+        """
+        async with self._condition:
+            while True:
+                if self.state == 'closed':
+                    return False
+                if self.state == 'open':
+                    delay = self._opened_until - time.monotonic()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(self._condition.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    self.state = 'half_open'
+                if not self._probing:
+                    self._probing = True
+                    return True
+                try:
+                    await asyncio.wait_for(self._condition.wait(), 0.5)
+                except asyncio.TimeoutError:
+                    pass
+
+    def release_probe(self):
+        self._probing = False
+
+    async def record_success(self):
+        if self.state == 'closed' and not self.consecutive_failures:
+            return
+        async with self._condition:
+            if self.state != 'closed':
+                print("Circuit breaker closed, resuming requests")
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._cooldown = self.base_cooldown
+            self._probing = False
+            self._condition.notify_all()
+
+    async def record_failure(self, retry_after=None):
+        async with self._condition:
+            self.consecutive_failures += 1
+            if self.state == 'open':
+                return
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                pause = max(self._cooldown, retry_after or 0)
+                reason = ("probe request failed" if self.state == 'half_open'
+                          else f"{self.consecutive_failures} consecutive failures")
+                self.state = 'open'
+                self._opened_until = time.monotonic() + pause
+                self._probing = False
+                self.trips += 1
+                print(f"Circuit breaker open ({reason}), pausing requests for {pause:.1f}s")
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                self._condition.notify_all()
+
+
+class AsyncChatClient:
+    """
+    基于 asyncio + aiohttp 的 chat-completions 客户端。
+    concurrency 限制同时在途的请求数，limiter 控制 RPM / TPM。
+    同一个连接池里的 keep-alive 连接在请求之间复用（连接数不超过 concurrency）；
+    429 / 5xx / 连接错误按 backoff_delay 退避后最多重试 max_retries 次，
+    breaker（可以在多个客户端之间共享）在持续故障时暂停所有请求。
+    """
+
+    def __init__(self, api_base=None, api_key=None, concurrency=8, limiter=None, timeout=120, cache=None,
+                 max_retries=6, backoff_base=1.0, backoff_cap=60.0, breaker=None):
+        self.api_base = (api_base or os.environ.get("OPENAI_API_BASE") or DEFAULT_API_BASE).rstrip('/')
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY", "")
+        self.limiter = limiter or RateLimiter()
+        self.timeout = timeout
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            headers=headers,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    async def chat(self, model, messages, max_tokens=1024, temperature=0.7, sample_index=0):
+        """发送一次 chat-completions 请求，返回回复文本（命中缓存时不发请求）"""
+        key = None
+        if self.cache is not None:
+            key = make_cache_key(model, messages, temperature, max_tokens, sample_index)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        estimated = estimate_tokens(messages, max_tokens)
+        for attempt in range(self.max_retries + 1):
+            probe = await self.breaker.acquire()
+            try:
+                data = await self._post(payload, estimated)
+                break
+            except TransientError as e:
+                await self.breaker.record_failure(e.retry_after)
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                # 在信号量之外等待，不占用并发名额
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap, e.retry_after))
+            except BaseException:
+                if probe:
+                    self.breaker.release_probe()
+                raise
+        await self.breaker.record_success()
+        self.limiter.settle(estimated, data.get('usage', {}).get('total_tokens'))
+        content = data['choices'][0]['message']['content'].strip()
+        if key is not None:
+            self.cache.put(key, content)
+        return content
+
+    async def _post(self, payload, estimated):
+        """发送一次请求；暂时性的失败转换为 TransientError，其他 HTTP 错误（如 400 / 401）直接抛出"""
+        async with self._semaphore:
+            await self.limiter.acquire(estimated)
+            self.requests += 1
+            try:
+                async with self._session.post(f"{self.api_base}/chat/completions", json=payload) as resp:
+                    if resp.status in RETRY_STATUSES:
+                        # 读完错误回复的正文，连接才能放回连接池复用
+                        await resp.read()
+                        raise TransientError(f"HTTP {resp.status}", resp.status,
+                                             parse_retry_after(resp.headers.get('Retry-After')))
+                    resp.raise_for_status()
+                    return await resp.json()
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                raise TransientError(f"{type(e).__name__}: {e}") from e
+
+    def stats(self):
+        return {'requests': self.requests, 'retries': self.retries, 'breaker_trips': self.breaker.trips}
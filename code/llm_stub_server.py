@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SALARY_PATTERN = re.compile(r'salary of \$(\d+)')
+NAME_PATTERN = re.compile(r'变化 (.+?) \S+ \d+ \d+ salary of')
+
+
+def _growth(salary, digest):
+    """按提示词哈希推算 24-32 岁每两年的工资"""
+    for i, age in enumerate(range(24, 34, 2)):
+        salary = int(salary * (1.08 + digest[i] / 255 * 0.1))
+        yield age, salary
+
+
+def fake_batch_completion(employees):
+    """批量提示词（每行一个员工的 JSON）：返回 JSON 数组，每个员工的每个年龄一个对象"""
+    items = []
+    for employee in employees:
+        profile = {key: value for key, value in employee.items() if key != 'id'}
+        digest = hashlib.sha1(json.dumps(profile, sort_keys=True, ensure_ascii=False).encode('utf-8')).digest()
+        position = str(employee.get('position', '1'))
+        for i, (age, salary) in enumerate(_growth(int(employee.get('salary') or 5000), digest)):
+            if digest[10 + i] % 2:
+                position = str(int(position) + 1) if position.isdigit() else position
+            items.append({"id": employee.get('id'), "name": employee.get('name'), "age": age,
+                          "position": position, "salary": salary})
+    return json.dumps(items, ensure_ascii=False)
+
+
+def fake_completion(messages):
+    """
+    根据提示词生成确定性的假回复：按起薪和提示词哈希推算 24-32 岁每两年的工资，
+    格式与 GPT 的真实输出一致（姓名一行，随后每行“年龄, $工资”）；批量提示词返回 JSON 数组。
+    """
+    prompt = messages[-1]['content'] if messages else ""
+    employees = [json.loads(line) for line in prompt.splitlines() if line.startswith('{"id"')]
+    if employees:
+        return fake_batch_completion(employees)
+    digest = hashlib.sha1(prompt.encode('utf-8')).digest()
+    match = SALARY_PATTERN.search(prompt)
+    salary = int(match.group(1)) if match else 5000
+    name_match = NAME_PATTERN.search(prompt)
+
+    lines = [name_match.group(1) if name_match else "Employee"]
+    for age, salary in _growth(salary, digest):
+        lines.append(f"{age}, ${salary}")
+    return "\n".join(lines)
+
+
+class ChatCompletionHandler(BaseHTTPRequestHandler):
+    """模拟 /v1/chat/completions 接口，用于离线测试预测流程"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        # 每个 TCP 连接创建一个处理器（keep-alive 的多个请求共用），用于统计连接复用情况
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with self.server.lock:
+            self.server.request_count += 1
+            status = _failure_status(self.server)
+            if status:
+                self.server.failure_count += 1
+        if status:
+            # 与真实接口一样带 Retry-After；保持连接（不用 send_error，它会关闭连接）
+            message = "Rate limit reached" if status == 429 else "The server is overloaded"
+            self._send_json(status, {"error": {"message": message, "type": "stub_error"}},
+                            {'Retry-After': str(self.server.retry_after)})
+            return
+
+        content = fake_completion(request.get('messages', []))
+        prompt_tokens = sum(len(m.get('content', '')) for m in request.get('messages', []))
+        body = {
+            "id": "stub-" + hashlib.sha1(content.encode('utf-8')).hexdigest()[:12],
+            "object": "chat.completion",
+            "model": request.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content),
+                "total_tokens": prompt_tokens + len(content),
+            },
+        }
+        self._send_json(200, body)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _failure_status(server):
+    """模拟不稳定的接口：outage 时间窗内全部返回 503，其余请求按 failure_rate 随机返回 429 / 503"""
+    if server.outage is not None:
+        start, duration = server.outage
+        if start <= time.monotonic() - server.started < start + duration:
+            return 503
+    if server.failure_rate and server.random.random() < server.failure_rate:
+        return server.random.choice((429, 503))
+    return None
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, outage=None, retry_after=1, seed=None):
+    """
+    创建模拟服务（port=0 时自动分配端口）。
+    failure_rate 为随机失败的比例，outage=(开始秒数, 持续秒数) 模拟一段持续的故障，
+    失败的回复都带 Retry-After: retry_after。
+    """
+    server = ThreadingHTTPServer((host, port), ChatCompletionHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.outage = outage
+    server.retry_after = retry_after
+    server.random = random.Random(seed)
+    server.started = time.monotonic()
+    server.request_count = 0
+    server.failure_count = 0
+    server.connection_count = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def serve_in_thread(**kwargs):
+    """在后台线程中启动模拟服务，返回 (server, api_base)"""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stub of the chat-completions endpoint")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to wait before each reply")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of requests answered 429/503")
+    parser.add_argument('--outage', type=float, nargs=2, metavar=('START', 'SECONDS'),
+                        help="answer every request with 503 during this window (seconds after start)")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds on failed replies")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.latency, args.failure_rate,
+                         tuple(args.outage) if args.outage else None, args.retry_after)
+    print(f"Stub chat-completions endpoint: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
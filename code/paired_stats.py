@@ -0,0 +1,121 @@
+import csv
+import math
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+# 样本数不超过该值时符号检验使用精确的二项分布，否则使用正态近似
+EXACT_SIGN_TEST_MAX_N = 2000
+
+
+def _read_ragged(path, n_cols):
+    """逐行读取，短行用空值补齐、长行截断到 n_cols 列（n_cols=None 时取第一行的列数）"""
+    rows = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            if n_cols is None:
+                n_cols = len(row)
+            rows.append((row + [''] * n_cols)[:n_cols])
+    return pd.DataFrame(rows, columns=range(n_cols or 0))
+
+
+@profiled(category='load')
+def load_matrix(path, n_cols=None):
+    """
+    把无表头的数字CSV整体读成 n_cols 列的 float 矩阵，格式错误或缺失的单元格为 NaN。
+    各行列数不一致时（某个员工少一个或多一个数字）不会报错：短行补 NaN，长行截断。
+    """
+    try:
+        df = pd.read_csv(path, header=None, engine='pyarrow')
+    except (ImportError, ValueError):
+        # ParserError 也是 ValueError：列数不一致的文件走逐行读取
+        df = _read_ragged(path, n_cols)
+    if n_cols is not None:
+        df = df.reindex(columns=range(n_cols))
+    return df.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+
+def _normal_two_sided_p(z):
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def sign_test_p(n_pos, n_neg):
+    """双侧符号检验 p 值（平局不计入）"""
+    n = n_pos + n_neg
+    if n == 0:
+        return 1.0
+    k = min(n_pos, n_neg)
+    if n <= EXACT_SIGN_TEST_MAX_N:
+        log_half_n = n * math.log(0.5)
+        tail = sum(math.exp(math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1) + log_half_n)
+                   for i in range(k + 1))
+        return min(1.0, 2 * tail)
+    z = (k + 0.5 - n / 2) / math.sqrt(n / 4)
+    return min(1.0, _normal_two_sided_p(z))
+
+
+def wilcoxon_p(diff):
+    """
+    Wilcoxon 符号秩检验的双侧 p 值（正态近似，含并列秩校正，丢弃零差值）。
+    """
+    diff = diff[diff != 0]
+    n = len(diff)
+    if n == 0:
+        return 1.0
+    order = np.argsort(np.abs(diff))
+    sorted_diff = diff[order]
+    sorted_abs = np.abs(sorted_diff)
+    # 并列值取平均秩
+    starts = np.flatnonzero(np.r_[True, sorted_abs[1:] != sorted_abs[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    avg_rank = starts + (counts + 1) / 2
+    ranks = np.repeat(avg_rank, counts)
+
+    w_plus = ranks[sorted_diff > 0].sum()
+    mean = n * (n + 1) / 4
+    var = n * (n + 1) * (2 * n + 1) / 24 - (counts ** 3 - counts).sum() / 48
+    if var <= 0:
+        return 1.0
+    return _normal_two_sided_p((w_plus - mean) / math.sqrt(var))
+
+
+@profiled(category='stats')
+def compare_matrices(a, b, columns=None):
+    """
+    对两个配对矩阵的每一列同时比较：A>B / B>A / A==B 的数量、配对差的均值和中位数，
+    以及符号检验和 Wilcoxon 检验的 p 值。任一侧为 NaN 的配对在该列中被忽略。
+    """
+    n_rows = min(len(a), len(b))
+    n_cols = min(a.shape[1], b.shape[1])
+    diff = a[:n_rows, :n_cols] - b[:n_rows, :n_cols]
+    valid = ~np.isnan(diff)
+
+    a_bigger = (diff > 0).sum(axis=0)
+    b_bigger = (diff < 0).sum(axis=0)
+    equal = (diff == 0).sum(axis=0)
+    with np.errstate(all='ignore'):
+        if valid.all():
+            mean_diff = diff.mean(axis=0)
+            median_diff = np.median(diff, axis=0)
+        else:
+            mean_diff = np.nanmean(diff, axis=0)
+            median_diff = np.nanmedian(diff, axis=0)
+
+    rows = []
+    for j in range(n_cols):
+        rows.append({
+            'A > B': int(a_bigger[j]),
+            'B > A': int(b_bigger[j]),
+            'A == B': int(equal[j]),
+            'n': int(valid[:, j].sum()),
+            'mean_diff': mean_diff[j],
+            'median_diff': median_diff[j],
+            'sign_test_p': sign_test_p(int(a_bigger[j]), int(b_bigger[j])),
+            'wilcoxon_p': wilcoxon_p(diff[valid[:, j], j]),
+        })
+    index = columns[:n_cols] if columns is not None else [f'col {j}' for j in range(n_cols)]
+    return pd.DataFrame(rows, index=index)
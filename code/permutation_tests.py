@@ -0,0 +1,208 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+# 分层内不同取值不超过该数时用多元超几何分布直接抽取“被分到男性的各取值个数”，
+# 否则对该分层的行生成随机键，用 argpartition 选出被分到男性的行
+MAX_DISTINCT_VALUES = 64
+# argpartition 模式下每个小批次最多展开的元素个数（控制内存）
+MAX_BATCH_ELEMENTS = 2 ** 24
+DEFAULT_STRATA = ('Department', 'Year', 'Group_Type')
+# 提前停止时 p 值的置信水平对应的 z 值（99.9%）
+EARLY_STOP_Z = 3.29
+
+_strata_state = None
+
+
+def mean_difference(male_means, female_means):
+    """默认统计量：每列的男性均值减女性均值"""
+    return male_means - female_means
+
+
+def mean_ratio_difference(male_means, female_means):
+    """两列（起点, 终点）的增长倍数之差：男性 终点/起点 减女性 终点/起点"""
+    return (male_means[:, 1] / male_means[:, 0] - female_means[:, 1] / female_means[:, 0])[:, None]
+
+
+def prepare_strata(df, columns, label='Gender', positive='Male', strata=DEFAULT_STRATA):
+    """
+    按分层整理每一列的数据。置换只在分层内交换性别标签，缺失值在对应列中剔除，
+    所以每个 (列, 分层) 只需要：取值（或去重后的取值和次数）、男性人数、该分层的总和。
+    返回每列一个分层列表，以及每列的 (男性人数, 总人数)。
+    """
+    strata = [s for s in strata if s in df.columns]
+    codes = df.groupby(strata, observed=True, dropna=False).ngroup().to_numpy() if strata \
+        else np.zeros(len(df), dtype=int)
+    is_positive = (df[label] == positive).to_numpy()
+
+    prepared, totals = [], []
+    for column in columns:
+        values = df[column].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        order = np.argsort(codes[valid], kind='stable')
+        x, code, male = values[valid][order], codes[valid][order], is_positive[valid][order]
+        bounds = np.flatnonzero(np.r_[True, code[1:] != code[:-1], True])
+
+        column_strata = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            xs, m = x[start:stop], int(male[start:stop].sum())
+            if m == 0 or m == len(xs):
+                # 全是同一性别的分层置换后不变，直接计入固定部分
+                column_strata.append((None, None, m, xs[male[start:stop]].sum(), xs.sum()))
+                continue
+            uniq, counts = np.unique(xs, return_counts=True)
+            if len(uniq) <= MAX_DISTINCT_VALUES:
+                column_strata.append((uniq, counts, m, None, xs.sum()))
+            else:
+                column_strata.append((xs, None, m, None, xs.sum()))
+        prepared.append(column_strata)
+        totals.append((int(male.sum()), len(x), x[male].sum(), x.sum()))
+    return prepared, totals
+
+
+def _subset_sums(values, counts, m, size, rng):
+    """从一个分层中随机选出 m 行作为男性（不放回），返回 size 次置换的男性取值之和"""
+    if counts is not None:
+        chosen = rng.multivariate_hypergeometric(counts, m, size=size)
+        return chosen @ values
+    n = len(values)
+    rows = max(MAX_BATCH_ELEMENTS // n, 1)
+    sums = np.empty(size)
+    for start in range(0, size, rows):
+        stop = min(start + rows, size)
+        keys = rng.random((stop - start, n))
+        idx = np.argpartition(keys, m - 1, axis=1)[:, :m]
+        sums[start:stop] = values[idx].sum(axis=1)
+    return sums
+
+
+def _init_worker(prepared, totals, statistic):
+    global _strata_state
+    _strata_state = (prepared, totals, statistic)
+
+
+def _permutation_batch(size, seed, state=None):
+    """一个批次的置换：返回 size 次置换的统计量 (size, k)"""
+    prepared, totals, statistic = state or _strata_state
+    rng = np.random.default_rng(seed)
+    male_means = np.empty((size, len(prepared)))
+    female_means = np.empty((size, len(prepared)))
+    for j, (column_strata, (n_male, n_total, _, total)) in enumerate(zip(prepared, totals)):
+        male_sum = np.zeros(size)
+        for values, counts, m, fixed, _ in column_strata:
+            male_sum += fixed if values is None else _subset_sums(values, counts, m, size, rng)
+        male_means[:, j] = male_sum / n_male
+        female_means[:, j] = (total - male_sum) / (n_total - n_male)
+    return statistic(male_means, female_means)
+
+
+def _resolved(exceed, done, alpha):
+    """p 值的置信区间已经完全落在 alpha 的一侧"""
+    p = (exceed + 1) / (done + 1)
+    margin = EARLY_STOP_Z * np.sqrt(p * (1 - p) / done)
+    return (p + margin < alpha) | (p - margin > alpha)
+
+
+@profiled(category='stats')
+def permutation_test(df, columns, label='Gender', positive='Male', strata=DEFAULT_STRATA,
+                     statistic=mean_difference, n_permutations=10000, batch_size=1000, alpha=0.05,
+                     early_stop=True, workers=1, seed=0):
+    """
+    分层置换检验（双侧）：在每个分层内随机重排性别标签，比较统计量的绝对值。
+    statistic(male_means, female_means) 接收 (B, 列数) 的男女均值，返回 (B, k) 个统计量，
+    必须是模块级函数（进程池需要 pickle）。
+
+    置换按 batch_size 分批，workers > 1 时每轮把 workers 个批次交给进程池。
+    early_stop=True 时，每轮之后所有 p 值的 99.9% 置信区间都不跨过 alpha 就提前停止。
+    返回 (观测统计量, p 值, 实际置换次数)，p 值为 (超过次数 + 1) / (置换次数 + 1)。
+    """
+    prepared, totals = prepare_strata(df, columns, label, positive, strata)
+    for column, (n_male, n_total, _, _) in zip(columns, totals):
+        if n_male == 0 or n_male == n_total:
+            raise ValueError(f"Column {column} needs observations from both {positive} and other groups")
+    observed_male = np.array([[male_total / n_male for n_male, _, male_total, _ in totals]])
+    observed_female = np.array([[(total - male_total) / (n_total - n_male)
+                                 for n_male, n_total, male_total, total in totals]])
+    observed = statistic(observed_male, observed_female)[0]
+    threshold = np.abs(observed) * (1 - 1e-12)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    n_batches = math.ceil(n_permutations / batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+    sizes = [min(batch_size, n_permutations - i * batch_size) for i in range(n_batches)]
+
+    exceed = np.zeros(len(observed), dtype=np.int64)
+    done = 0
+    executor = None
+    if workers > 1 and n_batches > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(prepared, totals, statistic))
+    try:
+        step = workers if executor is not None else 1
+        for start in range(0, n_batches, step):
+            round_sizes, round_seeds = sizes[start:start + step], seeds[start:start + step]
+            if executor is not None:
+                results = executor.map(_permutation_batch, round_sizes, round_seeds)
+            else:
+                state = (prepared, totals, statistic)
+                results = (_permutation_batch(size, s, state) for size, s in zip(round_sizes, round_seeds))
+            for stats, size in zip(results, round_sizes):
+                exceed += (np.abs(stats) >= threshold).sum(axis=0)
+                done += size
+            if early_stop and _resolved(exceed, done, alpha).all():
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return observed, (exceed + 1) / (done + 1), done
+
+
+def adjust_p_values(p_values, method='holm'):
+    """多重比较校正：holm（控制 FWER）、bonferroni 或 bh（Benjamini-Hochberg，控制 FDR）"""
+    p = np.asarray(p_values, dtype=float)
+    n = len(p)
+    if method == 'bonferroni':
+        return np.minimum(p * n, 1.0)
+    order = np.argsort(p)
+    ranked = p[order]
+    if method == 'holm':
+        adjusted = np.maximum.accumulate(ranked * (n - np.arange(n)))
+    elif method == 'bh':
+        adjusted = np.minimum.accumulate((ranked * n / np.arange(1, n + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"Unknown correction method: {method}")
+    result = np.empty(n)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+@profiled(category='stats')
+def gender_permutation_tests(df, metrics, by=None, strata=DEFAULT_STRATA, correction='holm', **kwargs):
+    """
+    对每个指标（by 给出时对 by 的每个取值分别）做男性均值减女性均值的分层置换检验，
+    并对全部检验一起做多重比较校正。kwargs 传给 permutation_test。
+
+    返回以 (by..., metric) 为索引的数据框：gap, p_value, p_adjusted, n_permutations。
+    """
+    metrics = list(metrics)
+    by = list(by) if by else []
+    parts = df.groupby(by, observed=True) if by else [((), df)]
+
+    rows, index = [], []
+    for key, part in parts:
+        key = key if isinstance(key, tuple) else (key,)
+        observed, p_values, done = permutation_test(part, metrics, strata=strata, **kwargs)
+        for metric, gap, p in zip(metrics, observed, p_values):
+            index.append(key + (metric,))
+            rows.append({'gap': gap, 'p_value': p, 'n_permutations': done})
+
+    result = pd.DataFrame(rows, index=pd.MultiIndex.from_tuples(index, names=by + ['metric']))
+    result.insert(2, 'p_adjusted', adjust_p_values(result['p_value'], correction))
+    return result
@@ -0,0 +1,281 @@
+import ast
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import NamedTuple
+
+from profiling import collect, merge, stage
+
+PIPELINE_STATE_PATH = ".pipeline_state.json"
+
+
+class PipelineStage(NamedTuple):
+    """
+    流水线中的一个阶段：func(**params) 读取 inputs 中的文件并写出 outputs 中的文件，路径相对于当前目录。
+    func 写成 "模块:函数" 字符串，运行到这个阶段时才导入模块，所有阶段都跳过时不会导入任何分析模块。
+    """
+    name: str
+    func: str
+    inputs: tuple = ()
+    outputs: tuple = ()
+    params: dict = {}
+
+
+def _init_worker():
+    """子进程只做无界面渲染"""
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('Agg')
+    else:
+        os.environ['MPLBACKEND'] = 'Agg'
+
+
+def resolve(func):
+    module_name, _, attr = func.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def file_digest(path, known=None):
+    """
+    文件内容的 sha256。known 是 {路径: {mtime, size, sha256}}，
+    mtime 和大小都没变的文件直接复用上次的哈希，不再读取大文件。
+    """
+    stat = os.stat(path)
+    signature = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+    if known is not None:
+        entry = known.get(path)
+        if entry and {k: entry[k] for k in signature} == signature:
+            return entry['sha256']
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    if known is not None:
+        known[path] = dict(signature, sha256=digest)
+    return digest
+
+
+def _module_file(module_name):
+    spec = importlib.util.find_spec(module_name)
+    if spec is not None and spec.origin and os.path.exists(spec.origin):
+        return spec.origin
+    return None
+
+
+def _imported_names(path):
+    """源文件中 import 的所有顶层模块名（包括函数内部的延迟导入）"""
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.partition('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.partition('.')[0])
+    return names
+
+
+def code_files(module_name):
+    """
+    模块本身以及它直接或间接导入的本地模块（与它在同一目录下的 .py 文件）的源文件路径。
+    只解析源码中的 import 语句，不导入任何模块；第三方库和标准库不计入。
+    """
+    root = _module_file(module_name)
+    if root is None:
+        return []
+    local_dir = os.path.dirname(os.path.abspath(root))
+    files = {os.path.abspath(root)}
+    todo = [root]
+    while todo:
+        for name in _imported_names(todo.pop()):
+            path = _module_file(name)
+            if path is None or os.path.dirname(os.path.abspath(path)) != local_dir:
+                continue
+            path = os.path.abspath(path)
+            if path not in files:
+                files.add(path)
+                todo.append(path)
+    return sorted(files)
+
+
+def stage_key(pipeline_stage, known=None):
+    """
+    阶段的输入指纹：函数所在模块及其导入的本地模块的源文件、参数和全部输入文件的内容。
+    哈希这些模块而不是只哈希 func，这样修改 func 调用的辅助函数（包括其它模块中的）也会让阶段重新运行；
+    源文件直接从磁盘读取，不需要导入模块。
+    """
+    h = hashlib.sha256()
+    h.update(pipeline_stage.func.encode('utf-8'))
+    for path in code_files(pipeline_stage.func.partition(':')[0]):
+        h.update(file_digest(path, known).encode('utf-8'))
+    h.update(repr(sorted(pipeline_stage.params.items())).encode('utf-8'))
+    for path in pipeline_stage.inputs:
+        h.update(f"{path}:{file_digest(path, known)}".encode('utf-8'))
+    return h.hexdigest()
+
+
+def plan(stages):
+    """
+    检查阶段声明并返回 {阶段名: 依赖的阶段名集合}。
+    某个阶段的输入是另一个阶段的输出时两者之间有一条边；不由任何阶段产生的输入必须已经存在。
+    """
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    producers = {}
+    for s in stages:
+        for path in s.outputs:
+            if path in producers:
+                raise ValueError(f"{path} is produced by both {producers[path]} and {s.name}")
+            producers[path] = s.name
+
+    deps = {}
+    for s in stages:
+        missing = [path for path in s.inputs if path not in producers and not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Stage {s.name}: missing input file(s) {missing}")
+        deps[s.name] = {producers[path] for path in s.inputs if path in producers} - {s.name}
+
+    # 拓扑排序检查环
+    resolved = set()
+    remaining = dict(deps)
+    while remaining:
+        ready = [name for name, d in remaining.items() if d <= resolved]
+        if not ready:
+            raise ValueError(f"Dependency cycle among stages: {sorted(remaining)}")
+        resolved.update(ready)
+        for name in ready:
+            del remaining[name]
+    return deps
+
+
+def _run_stage(pipeline_stage):
+    with stage(pipeline_stage.name, 'pipeline'):
+        resolve(pipeline_stage.func)(**pipeline_stage.params)
+
+
+def _run_stage_in_worker(pipeline_stage):
+    """子进程中的阶段：返回子进程里记录的 profiling 阶段"""
+    with collect() as stages:
+        _run_stage(pipeline_stage)
+    return stages
+
+
+class PipelineState:
+    """
+    记录每个阶段上次成功运行时的输入指纹和输入 / 输出文件的哈希。
+    指纹未变且输出文件都还在的阶段下次直接跳过。
+    """
+
+    def __init__(self, path=PIPELINE_STATE_PATH):
+        self.path = path
+        self.stages = {}
+        self.files = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                self.stages, self.files = state['stages'], state['files']
+            except (OSError, ValueError, KeyError):
+                self.stages, self.files = {}, {}
+
+    def is_current(self, pipeline_stage, key):
+        return (self.stages.get(pipeline_stage.name) == key
+                and all(os.path.exists(path) for path in pipeline_stage.outputs))
+
+    def record(self, pipeline_stage, key):
+        self.stages[pipeline_stage.name] = key
+        # 顺便记下输出的哈希，下游阶段计算指纹时不必再读一遍
+        for path in pipeline_stage.outputs:
+            file_digest(path, self.files)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stages': self.stages, 'files': self.files}, f, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def run_pipeline(stages, workers=None, state_path=PIPELINE_STATE_PATH, force=False, dry_run=False):
+    """
+    按依赖关系运行阶段：依赖都已完成的阶段立即提交，互相独立的阶段在多个进程中并行。
+    输入指纹（代码 + 参数 + 输入文件内容）与上次相同且输出仍在的阶段跳过；force=True 时全部重跑。
+    上游阶段重新运行后，下游阶段的指纹按新的输入文件计算，内容没有变化时下游仍然会跳过。
+    dry_run=True 时只打印计划，不运行任何阶段（尚未生成的输入按“需要运行”处理）。
+    返回 {阶段名: 'ran' / 'skipped' / 'pending'}。
+    """
+    deps = plan(stages)
+    by_name = {s.name: s for s in stages}
+    state = PipelineState(state_path)
+    status = {}
+
+    if workers is None:
+        workers = min(len(stages), os.cpu_count() or 1)
+    executor = None
+    if workers > 1 and not dry_run:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    else:
+        _init_worker()
+
+    running = {}
+    keys = {}
+
+    def submit_ready():
+        for name in [n for n in by_name if n not in status and n not in running.values()]:
+            if not all(status.get(d) in ('ran', 'skipped') for d in deps[name]):
+                if dry_run and all(d in status for d in deps[name]):
+                    status[name] = 'pending'
+                    print(f"  run      {name} (after {', '.join(sorted(deps[name]))})")
+                continue
+            s = by_name[name]
+            key = stage_key(s, state.files)
+            if not force and state.is_current(s, key):
+                status[name] = 'skipped'
+                print(f"  skipped  {name} (unchanged)")
+                return True
+            if dry_run:
+                status[name] = 'pending'
+                print(f"  run      {name}")
+                return True
+            keys[name] = key
+            print(f"  run      {name}")
+            if executor is None:
+                _run_stage(s)
+                finish(name)
+                return True
+            running[executor.submit(_run_stage_in_worker, s)] = name
+        return False
+
+    def finish(name):
+        state.record(by_name[name], keys[name])
+        state.save()
+        status[name] = 'ran'
+
+    try:
+        # 每次有阶段完成（或被跳过）就重新检查哪些阶段可以开始
+        while len(status) < len(stages):
+            if submit_ready():
+                continue
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                merge(future.result())
+                finish(name)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    ran = [name for name, s in status.items() if s == 'ran']
+    skipped = [name for name, s in status.items() if s == 'skipped']
+    if dry_run:
+        print(f"\nPipeline plan: {len(status) - len(skipped)} stage(s) to run, {len(skipped)} unchanged")
+    else:
+        print(f"\nPipeline: {len(ran)} stage(s) ran, {len(skipped)} skipped (unchanged)")
+    return status
@@ -0,0 +1,104 @@
+import html
+import os
+
+import numpy as np
+
+from profiling import stage
+
+# full: 每个 HTML 内嵌完整的 plotly.js（原来的行为）
+# shared: 同目录下共享一个 plotly.min.js，数据以紧凑的类型化数组编码
+# cdn: 从 CDN 加载 plotly.js
+EXPORT_MODES = ('full', 'shared', 'cdn')
+DEFAULT_EXPORT_MODE = 'shared'
+
+ARRAY_PROPERTIES = ['x', 'y', 'z', 'r', 'values', 'customdata', 'marker.size', 'marker.color', 'line.color']
+
+
+def compact_array(values):
+    """
+    把数值序列转换为最窄的 numpy 类型（整数取能容纳取值范围的最小整型，浮点用 float32），
+    Plotly 会把 numpy 数组编码为 base64 类型化数组，而不是逐个写出的 JSON 数字。
+    非数值数据原样返回。
+    """
+    if values is None or isinstance(values, str):
+        return values
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'iub' and arr.size:
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if info.min <= arr.min() and arr.max() <= info.max:
+                return arr.astype(dtype)
+        return arr
+    if arr.dtype.kind == 'f':
+        return arr.astype(np.float32)
+    return values
+
+
+def compact_figure(fig):
+    """就地压缩图中所有 trace（包括动画帧）的数值数组"""
+    traces = list(fig.data)
+    for frame in fig.frames or ():
+        traces.extend(frame.data)
+    for trace in traces:
+        for prop in ARRAY_PROPERTIES:
+            try:
+                values = trace[prop]
+            except (KeyError, ValueError, AttributeError):
+                continue
+            if values is not None and not isinstance(values, str):
+                trace[prop] = compact_array(values)
+        for dimension in getattr(trace, 'dimensions', None) or ():
+            dimension['values'] = compact_array(dimension['values'])
+    return fig
+
+
+def write_figure(fig, path, mode=DEFAULT_EXPORT_MODE):
+    """按导出模式写出交互式 HTML"""
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"Unknown export mode: {mode} (expected one of {EXPORT_MODES})")
+    if mode == 'full':
+        with stage('write_html', 'render'):
+            fig.write_html(path)
+        return
+    compact_figure(fig)
+    # 'directory' 会在 HTML 所在目录写一份 plotly.min.js（已存在则复用）并通过 <script src> 引用
+    with stage('write_html', 'render'):
+        fig.write_html(path, include_plotlyjs='directory' if mode == 'shared' else 'cdn')
+
+
+REPORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>{title}</title>
+<style>
+body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; max-width: 1280px; margin: 0 auto; padding: 20px; }}
+section {{ margin-bottom: 40px; }}
+iframe {{ width: 100%; height: {height}px; border: 1px solid #ddd; border-radius: 8px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{sections}
+</body>
+</html>
+"""
+
+
+def write_report(pages, path="report.html", title="Interactive Report", height=720):
+    """
+    把多个已导出的 HTML 图表合并到一个报告页面。
+    每个图表放在 loading="lazy" 的 iframe 中，滚动到附近时才加载；
+    shared 模式下所有图表共用浏览器缓存中的同一个 plotly.min.js。
+    pages 是 (标题, HTML 路径) 列表。
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    sections = []
+    for heading, page in pages:
+        src = os.path.relpath(os.path.abspath(page), base).replace(os.sep, '/')
+        sections.append(
+            f'<section><h2>{html.escape(heading)}</h2>'
+            f'<iframe loading="lazy" src="{html.escape(src)}"></iframe></section>'
+        )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(REPORT_TEMPLATE.format(title=html.escape(title), sections="\n".join(sections), height=height))
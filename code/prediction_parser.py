@@ -0,0 +1,123 @@
+import os
+import re
+from itertools import groupby
+from typing import NamedTuple, Optional
+
+
+class PredictionRecord(NamedTuple):
+    """单个员工在某个年龄的预测结果"""
+    name: str
+    age: int
+    level: Optional[str]
+    salary: Optional[int]
+    promoted: Optional[bool]
+
+
+# 年龄后面可以跟“岁”和各种分隔符，例如 “24岁, $6500” / “24, $5700” / “24岁, 工资$8500”
+AGE_PREFIX = r'(\d{2})\s*岁?\s*[,，:：]?\s*'
+SALARY_FILLER = r'[^\d$\n]{0,12}?'
+SALARY_PATTERN = re.compile(AGE_PREFIX + SALARY_FILLER + r'\$\s*([\d,]+)')
+# “24 不是” / “26 是，正式员工” / “24, 是, 正式员工” / “Yuri, 24 不是, 26 是, Senior Analyst, ...”
+PROMOTION_PATTERN = re.compile(AGE_PREFIX + r'(不是|是|否)\s*(?:[,，]\s*)?([^,，\d]*)')
+# task3: “Name Gender Age Level salary of $X” 或 “Name Gender Age Level X”
+TASK3_PATTERN = re.compile(
+    r'^(?P<name>.+?)\s+(?:Male|Female)\s+(?P<age>\d+)\s+(?P<level>\d+(?:\.\d+)?)\s+'
+    r'(?:salary of\s+)?\$?(?P<salary>[\d,]+)\s*$'
+)
+NAME_STRIP = ' \t,，:：'
+# 工资矩阵的列：24-32 岁每两年一列
+SALARY_AGES = (24, 26, 28, 30, 32)
+
+
+def iter_lines(path, encoding='utf-8'):
+    """逐行读取文件（不会把整个文件读入内存）"""
+    with open(path, 'r', encoding=encoding) as f:
+        for line in f:
+            yield line.rstrip('\r\n')
+
+
+def _iter_block_records(lines, pattern, build):
+    """
+    解析“姓名一行，随后若干数据行”的块格式。
+    一行中第一个匹配之前的文字视为新的姓名（兼容姓名和数据写在同一行的情况）。
+    """
+    name = None
+    for line in lines:
+        matches = list(pattern.finditer(line))
+        if not matches:
+            text = line.strip(NAME_STRIP)
+            if text:
+                name = text
+            continue
+
+        prefix = line[:matches[0].start()].strip(NAME_STRIP)
+        if prefix:
+            name = prefix
+        if name is None:
+            continue
+        for match in matches:
+            yield build(name, match)
+
+
+def _build_salary(name, match):
+    return PredictionRecord(name, int(match.group(1)), None, int(match.group(2).replace(',', '')), None)
+
+
+def _build_promotion(name, match):
+    level = match.group(3).strip() or None
+    return PredictionRecord(name, int(match.group(1)), level, None, match.group(2) == '是')
+
+
+def iter_salary_records(lines, symbol='$'):
+    """解析 *_predictions_year_salary.csv"""
+    pattern = SALARY_PATTERN
+    if symbol != '$':
+        pattern = re.compile(AGE_PREFIX + SALARY_FILLER + re.escape(symbol) + r'\s*([\d,]+)')
+    return _iter_block_records(lines, pattern, _build_salary)
+
+
+def iter_promotion_records(lines):
+    """解析 *_predictions_year_promotion.csv"""
+    return _iter_block_records(lines, PROMOTION_PATTERN, _build_promotion)
+
+
+def iter_task3_records(lines):
+    """解析 task3 的 *_predictions_year_2.csv，忽略说明性的文字行"""
+    for line in lines:
+        match = TASK3_PATTERN.match(line.strip())
+        if match:
+            yield PredictionRecord(
+                match.group('name'),
+                int(match.group('age')),
+                match.group('level'),
+                int(match.group('salary').replace(',', '')),
+                None
+            )
+
+
+def iter_file_records(path):
+    """按文件名选择解析器，逐条产出 PredictionRecord"""
+    name = os.path.basename(path)
+    lines = iter_lines(path)
+    if 'promotion' in name:
+        return iter_promotion_records(lines)
+    if 'predictions_year_2' in name:
+        return iter_task3_records(lines)
+    return iter_salary_records(lines)
+
+
+def salary_row(records, ages=SALARY_AGES):
+    """
+    一个员工的记录按年龄放进固定的列（ages），缺失的年龄为 None，不在 ages 中的年龄（例如 22 岁）丢弃。
+    同一年龄出现多次时取第一次。
+    """
+    salaries = {}
+    for record in records:
+        salaries.setdefault(record.age, record.salary)
+    return [salaries.get(age) for age in ages]
+
+
+def iter_employees(records):
+    """把连续的同名记录归为一个员工，产出 (name, [PredictionRecord, ...])"""
+    for name, group in groupby(records, key=lambda r: r.name):
+        yield name, list(group)
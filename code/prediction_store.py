@@ -0,0 +1,146 @@
+import json
+import os
+
+
+def failures_path_for(path):
+    """失败记录文件与输出文件放在一起：xxx.jsonl -> xxx.failed.jsonl"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.failed{ext or '.jsonl'}"
+
+
+def iter_records(path):
+    """
+    逐行读取 JSONL 记录。崩溃时可能留下写了一半的最后一行，直接跳过。
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def load_completed(path):
+    """返回已经完成的员工对编号集合"""
+    return {record['pair'] for record in iter_records(path)}
+
+
+def load_failed(path):
+    """返回失败记录中的员工对编号集合"""
+    return {record['pair'] for record in iter_records(failures_path_for(path))}
+
+
+def _drop_partial_line(path, block_size=1 << 16):
+    """
+    崩溃时写了一半的最后一行截掉（截断到最后一个换行符之后），
+    否则追加的下一条记录会接在残片后面，合成一行无效的 JSON 而被读取时跳过。
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+class PredictionWriter:
+    """
+    以追加方式写入 JSONL 预测结果：每条记录写完立即 flush，
+    每 fsync_every 条调用一次 fsync，关闭时再 fsync 一次，崩溃时最多丢失最后一批。
+    两个预测都成功的员工对写入输出文件，否则写入失败记录文件以便定向重试。
+    追加时先去掉上次崩溃留下的半行。
+    """
+
+    def __init__(self, path, fsync_every=20, append=True):
+        self.path = path
+        self.fsync_every = fsync_every
+        mode = 'a' if append else 'w'
+        if append:
+            _drop_partial_line(path)
+            _drop_partial_line(failures_path_for(path))
+        self._out = open(path, mode, encoding='utf-8')
+        self._failed = open(failures_path_for(path), mode, encoding='utf-8')
+        self._pending = 0
+        self.written = 0
+        self.failed = 0
+
+    def _write(self, f, record):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        self._pending += 1
+        if self._pending >= self.fsync_every:
+            self.sync()
+
+    def write_pair(self, index, male_row, female_row, male_prediction, female_prediction):
+        record = {
+            'pair': index,
+            'male_name': male_row[0],
+            'female_name': female_row[0],
+        }
+        if male_prediction and female_prediction:
+            record['male_prediction'] = male_prediction
+            record['female_prediction'] = female_prediction
+            self._write(self._out, record)
+            self.written += 1
+        else:
+            record['male_ok'] = bool(male_prediction)
+            record['female_ok'] = bool(female_prediction)
+            self._write(self._failed, record)
+            self.failed += 1
+
+    def sync(self):
+        for f in (self._out, self._failed):
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = 0
+
+    def close(self):
+        self.sync()
+        self._out.close()
+        self._failed.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_predictions(path, field, output_file):
+    """
+    按员工对编号顺序把某一列（male_prediction / female_prediction）导出为原来的纯文本格式。
+    只在内存中保存每条记录的文件偏移量，不保存预测文本本身。
+    """
+    offsets = {}
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+                offsets[record['pair']] = offset
+            except ValueError:
+                pass
+            offset += len(line)
+
+    with open(path, 'rb') as f, open(output_file, 'w', encoding='utf-8') as out:
+        for i, pair in enumerate(sorted(offsets)):
+            f.seek(offsets[pair])
+            record = json.loads(f.readline())
+            if i:
+                out.write('\n')
+            out.write(record[field])
+    return len(offsets)
@@ -0,0 +1,234 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# 每个阶段的记录：name, category, pid, tid, ts_us（开始时间，微秒，跨进程可比）,
+# wall_s, cpu_s, rss_start_mb, peak_rss_mb, rows, depth
+_records = []
+_stack = []
+_lock = threading.Lock()
+
+
+def _proc_status_mb(field):
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    raise OSError(field)
+
+
+def reset_peak_rss():
+    """Linux 上把进程的 RSS 峰值（VmHWM）重置为当前值；不支持时返回 False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_mb():
+    try:
+        return _proc_status_mb('VmRSS')
+    except OSError:
+        return float('nan')
+
+
+def peak_rss_mb():
+    """
+    进程的 RSS 峰值（MB）。Linux 上是上次 reset_peak_rss 以来的峰值，
+    其他平台是进程启动以来的峰值（ru_maxrss，macOS 以字节为单位）。
+    """
+    try:
+        return _proc_status_mb('VmHWM')
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def count_rows(obj):
+    """数据框 / 数组的行数，其他对象返回 None"""
+    shape = getattr(obj, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+class Stage:
+    """
+    一个阶段；rows 可以在阶段内部赋值（例如读完文件后才知道行数）。
+    退出后 wall / cpu / rss_start / peak 为该阶段的测量结果。
+    """
+
+    def __init__(self, name, category, rows=None):
+        self.name = name
+        self.category = category
+        self.rows = rows
+        self.peak = 0.0
+        self.rss_start = float('nan')
+        self.wall = self.cpu = None
+
+    def _observe_peak(self):
+        self.peak = max(self.peak, peak_rss_mb())
+
+
+@contextlib.contextmanager
+def stage(name, category='stage', rows=None):
+    """
+    记录一个阶段的墙钟时间、CPU时间、RSS 峰值和行数。可以嵌套：
+    进入子阶段前先把当前峰值计入父阶段再重置，退出时子阶段的峰值再并入父阶段，
+    所以每一层的峰值都是准确的。
+    """
+    current = Stage(name, category, rows)
+    if _stack:
+        _stack[-1]._observe_peak()
+    reset_peak_rss()
+    current.rss_start = current_rss_mb()
+    ts = time.time_ns() // 1000
+    wall, cpu = time.perf_counter(), time.process_time()
+    _stack.append(current)
+    try:
+        yield current
+    finally:
+        current.wall, current.cpu = time.perf_counter() - wall, time.process_time() - cpu
+        _stack.pop()
+        current._observe_peak()
+        if _stack:
+            _stack[-1].peak = max(_stack[-1].peak, current.peak)
+        with _lock:
+            _records.append({
+                'name': name,
+                'category': category,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'ts_us': ts,
+                'wall_s': current.wall,
+                'cpu_s': current.cpu,
+                'rss_start_mb': current.rss_start,
+                'peak_rss_mb': current.peak,
+                'rows': current.rows,
+                'depth': len(_stack),
+            })
+
+
+def profiled(name=None, category='stage'):
+    """
+    装饰器版本的 stage。行数取第一个位置参数的行数（输入的数据框或数组），
+    第一个参数不是数据时取返回值的行数。
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label, category, count_rows(args[0]) if args else None) as current:
+                result = func(*args, **kwargs)
+                if current.rows is None:
+                    current.rows = count_rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+def merge(worker_records):
+    """并入子进程返回的记录（Chrome trace 中按 pid 显示为单独的轨道）"""
+    with _lock:
+        _records.extend(worker_records)
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    在子进程中使用：临时清空记录和阶段栈（fork 出来的子进程会继承父进程的），
+    退出时把这段时间内的记录放进 yield 出的列表，交给父进程 merge。
+    """
+    global _records, _stack
+    saved = _records, _stack
+    _records, _stack = [], []
+    collected = []
+    try:
+        yield collected
+    finally:
+        collected.extend(_records)
+        _records, _stack = saved
+
+
+def clear():
+    with _lock:
+        del _records[:]
+
+
+def summary_rows(stage_records=None):
+    """按阶段名汇总（按第一次出现的顺序）：调用次数、总耗时、最大峰值、总行数"""
+    stage_records = records() if stage_records is None else stage_records
+    summary = {}
+    for record in sorted(stage_records, key=lambda r: r['ts_us']):
+        row = summary.setdefault(record['name'], {
+            'stage': record['name'], 'category': record['category'], 'depth': record['depth'],
+            'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0, 'rows': None,
+        })
+        row['calls'] += 1
+        row['wall_s'] += record['wall_s']
+        row['cpu_s'] += record['cpu_s']
+        row['peak_rss_mb'] = max(row['peak_rss_mb'], record['peak_rss_mb'])
+        if record['rows'] is not None:
+            row['rows'] = (row['rows'] or 0) + record['rows']
+    return list(summary.values())
+
+
+def format_summary(stage_records=None):
+    """控制台汇总表；嵌套的阶段按层级缩进"""
+    rows = summary_rows(stage_records)
+    if not rows:
+        return "No stages recorded."
+    width = max(len('  ' * row['depth'] + row['stage']) for row in rows)
+    lines = [f"{'stage':<{width}}  {'category':<10} {'calls':>5} {'wall s':>9} {'cpu s':>9} "
+             f"{'peak MB':>9} {'rows':>12}"]
+    for row in rows:
+        rows_text = f"{row['rows']:,}" if row['rows'] is not None else '-'
+        lines.append(f"{'  ' * row['depth'] + row['stage']:<{width}}  {row['category']:<10} {row['calls']:>5} "
+                     f"{row['wall_s']:9.3f} {row['cpu_s']:9.3f} {row['peak_rss_mb']:9.1f} {rows_text:>12}")
+    return '\n'.join(lines)
+
+
+def chrome_trace(stage_records=None):
+    """Chrome trace 格式（chrome://tracing 或 Perfetto 可直接打开）的完整事件"""
+    stage_records = records() if stage_records is None else stage_records
+    events = []
+    for record in stage_records:
+        events.append({
+            'name': record['name'],
+            'cat': record['category'],
+            'ph': 'X',
+            'ts': record['ts_us'],
+            'dur': round(record['wall_s'] * 1e6),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': {key: record[key] for key in ('cpu_s', 'rss_start_mb', 'peak_rss_mb', 'rows')},
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_trace(output_dir='.', prefix='profile'):
+    """写出 <prefix>.json（阶段记录和汇总）和 <prefix>_trace.json（Chrome trace），返回两个路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    stage_records = records()
+    json_path = os.path.join(output_dir, f'{prefix}.json')
+    trace_path = os.path.join(output_dir, f'{prefix}_trace.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'stages': stage_records, 'summary': summary_rows(stage_records)}, f, indent=2)
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(stage_records), f)
+    return json_path, trace_path
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from build_manifest import fingerprint
+from profiling import collect, merge, profiled, stage
+
+
+def _init_worker():
+    """子进程只做无界面渲染（只生成 Plotly 图的脚本不需要 matplotlib）"""
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('Agg')
+    else:
+        os.environ['MPLBACKEND'] = 'Agg'
+
+
+def _run_job(label, func, args):
+    start = time.perf_counter()
+    with stage(label, 'render'):
+        func(*args)
+    return label, time.perf_counter() - start
+
+
+def _run_job_in_worker(label, func, args):
+    """子进程中的渲染任务：连同子进程里记录的 profiling 阶段一起返回"""
+    with collect() as stages:
+        result = _run_job(label, func, args)
+    return result, stages
+
+
+@profiled(category='render')
+def render_figures(jobs, workers=None, manifest=None):
+    """
+    并行渲染互相独立的图表。
+
+    jobs 是 (label, func, args) 列表，label 为产物文件路径，func 必须是模块级函数，
+    args 只应包含该图需要的（尽量是预先聚合好的）数据，以减少传给子进程的数据量。
+    workers=None 表示每个图一个进程（不超过CPU核心数），workers=1 时在当前进程中顺序执行。
+    传入 manifest（build_manifest.BuildManifest）时，输入指纹未变的产物直接跳过。
+    返回 {label: 耗时秒数}（只包含实际渲染的图）。
+    """
+    fingerprints = {}
+    if manifest is not None:
+        pending = []
+        for label, func, args in jobs:
+            fp = fingerprint(func, args)
+            if manifest.is_current(label, fp):
+                manifest.skip(label)
+            else:
+                fingerprints[label] = fp
+                pending.append((label, func, args))
+        jobs = pending
+    if not jobs:
+        return {}
+
+    timings = {}
+
+    def done(label, elapsed):
+        timings[label] = elapsed
+        if manifest is not None:
+            manifest.record(label, fingerprints[label])
+        print(f"- {label} ({elapsed:.1f}s)")
+
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+
+    if workers <= 1:
+        _init_worker()
+        for label, func, args in jobs:
+            done(*_run_job(label, func, args))
+        return timings
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(_run_job_in_worker, label, func, args) for label, func, args in jobs]
+        for future in as_completed(futures):
+            result, stages = future.result()
+            merge(stages)
+            done(*result)
+    return timings
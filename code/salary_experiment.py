@@ -0,0 +1,67 @@
+"""
+task4 工资预测实验的完整流水线：predict（task4_code2）→ extract / tables（task4_code3）
+→ compare（task4_code1）/ plot（task3_code3）。所有路径相对于数据目录。
+"""
+from pipeline import PipelineStage, run_pipeline
+
+EMPLOYEE_FILES = {'male': '男_实验组_第0年.csv', 'female': '女_实验组_第0年.csv'}
+PREDICTION_FILES = {'male': '男_predictions_year_salary.csv', 'female': '女_predictions_year_salary.csv'}
+MATRIX_FILES = {'male': 'male_salary.csv', 'female': 'female_salary.csv'}
+TABLE_FILES = {'male': 'male_salary_table.csv', 'female': 'female_salary_table.csv'}
+PREDICTIONS_PATH = 'predictions_year_salary.jsonl'  # 与 task4_code2.PREDICTIONS_PATH 相同
+COMPARISON_FILE = 'paired_comparison.csv'
+FIGURES = ['avg_growth_by_gender.png', 'avg_growth_by_department.png', 'avg_growth_by_salary_range.png',
+           'growth_distribution_by_gender.png', 'growth_by_age_intervals.png',
+           'conditional_salary_growth_by_gender.png']
+
+
+def build_stages(api_base=None, concurrency=8, requests_per_minute=500, tokens_per_minute=300000,
+                 cache_path='llm_response_cache.sqlite', symbol='$', max_lines=100, batch_size=1):
+    """实验的阶段声明；extract 和 tables 只依赖 predict 的输出，可以并行，compare 和 plot 也一样"""
+    predictions = PREDICTIONS_PATH
+    stages = [
+        PipelineStage(
+            'predict', 'task4_code2:main',
+            inputs=(EMPLOYEE_FILES['male'], EMPLOYEE_FILES['female']),
+            outputs=(predictions, PREDICTION_FILES['male'], PREDICTION_FILES['female']),
+            params={'async_mode': True, 'concurrency': concurrency, 'requests_per_minute': requests_per_minute,
+                    'tokens_per_minute': tokens_per_minute, 'cache_path': cache_path,
+                    'output_path': predictions, 'api_base': api_base, 'batch_size': batch_size},
+        ),
+        PipelineStage(
+            'extract', 'task4_code3:main',
+            inputs=(PREDICTION_FILES['male'], PREDICTION_FILES['female']),
+            outputs=(MATRIX_FILES['male'], MATRIX_FILES['female']),
+            params={'data_dir': '.', 'symbol': symbol, 'max_lines': max_lines},
+        ),
+    ]
+    for gender in ('male', 'female'):
+        stages.append(PipelineStage(
+            f'tables_{gender}', 'task4_code3:build_salary_table',
+            inputs=(predictions, EMPLOYEE_FILES[gender]),
+            outputs=(TABLE_FILES[gender],),
+            params={'predictions_path': predictions, 'field': f'{gender}_prediction',
+                    'employees_file': EMPLOYEE_FILES[gender], 'output_file': TABLE_FILES[gender],
+                    'symbol': symbol},
+        ))
+    stages += [
+        PipelineStage(
+            'compare', 'task4_code1:main',
+            inputs=(MATRIX_FILES['male'], MATRIX_FILES['female']),
+            outputs=(COMPARISON_FILE,),
+            params={'male_file': MATRIX_FILES['male'], 'female_file': MATRIX_FILES['female'],
+                    'output_file': COMPARISON_FILE},
+        ),
+        PipelineStage(
+            'plot', 'task3_code3:main',
+            inputs=(TABLE_FILES['female'], TABLE_FILES['male']),
+            outputs=tuple(FIGURES),
+            params={'female_file_path': TABLE_FILES['female'], 'male_file_path': TABLE_FILES['male']},
+        ),
+    ]
+    return stages
+
+
+def main(workers=None, force=False, dry_run=False, **kwargs):
+    """在当前目录运行整个实验，kwargs 传给 build_stages"""
+    return run_pipeline(build_stages(**kwargs), workers=workers, force=force, dry_run=dry_run)
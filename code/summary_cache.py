@@ -0,0 +1,110 @@
+import glob
+import json
+import os
+
+# 只依赖标准库：缓存命中时 summary 命令不需要导入 numpy / pandas
+SUMMARY_CACHE_PATH = os.path.join(".cohort_cache", "summary_cube.json")
+# 立方体格式变化时递增，让旧缓存失效
+CUBE_FORMAT = 1
+
+
+def cohort_files(pattern="*.csv"):
+    return sorted(glob.glob(pattern))
+
+
+def _sources(files):
+    sources = {}
+    for file in files:
+        stat = os.stat(file)
+        sources[os.path.abspath(file)] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+    return sources
+
+
+def load_cells(files, path=SUMMARY_CACHE_PATH):
+    """源文件（mtime + size）和立方体格式都没有变化时返回缓存的立方体格子，否则返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cells = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cells.get('format') != CUBE_FORMAT or cells.get('sources') != _sources(files):
+        return None
+    return cells
+
+
+def save_cells(cube, files, path=SUMMARY_CACHE_PATH):
+    """把 aggregate_cube 的立方体（count / sum / m2）连同源文件签名写成 JSON，返回写入的内容"""
+    table = cube.reset_index()
+    table = table.astype(object).where(table.notna(), None)
+    cells = {
+        'format': CUBE_FORMAT,
+        'sources': _sources(files),
+        'keys': list(cube.index.names),
+        'metrics': list(cube.attrs['metrics']),
+        'columns': list(table.columns),
+        'rows': table.values.tolist(),
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cells, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return cells
+
+
+def _merge(a, b):
+    """Chan 的并行合并：两组 (n, mean, m2) 合并为一组"""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+def summarize_cells(cells, by):
+    """
+    把格子上卷到 by 这几个维度，返回 {分组: {指标: (mean, std)}}，分组按键排序。
+    与 aggregate_cube.cube_stats(cube, by) 的 mean / std 相同。
+    """
+    position = {col: i for i, col in enumerate(cells['columns'])}
+    missing = [col for col in by if col not in cells['keys']]
+    if missing:
+        raise ValueError(f"Unknown summary dimension(s): {missing} (available: {cells['keys']})")
+
+    groups = {}
+    for row in cells['rows']:
+        key = tuple(row[position[col]] for col in by)
+        n = row[position['count']]
+        moments = [(n, row[position[f'{metric}_sum']] / n, row[position[f'{metric}_m2']])
+                   for metric in cells['metrics']]
+        if key in groups:
+            groups[key] = [_merge(a, b) for a, b in zip(groups[key], moments)]
+        else:
+            groups[key] = moments
+
+    summary = {}
+    for key in sorted(groups, key=lambda k: [(v is None, v if v is not None else 0) for v in k]):
+        summary[key] = {
+            metric: (mean, (m2 / (n - 1)) ** 0.5 if n > 1 else float('nan'))
+            for metric, (n, mean, m2) in zip(cells['metrics'], groups[key])
+        }
+    return summary
+
+
+def format_summary(summary, by, metrics, digits=2):
+    """按 cube_stats 的布局（每个指标两列 mean / std）格式化为文本表格"""
+    key_width = [max([len(col)] + [len(str(key[i])) for key in summary]) for i, col in enumerate(by)]
+    width = max(digits + 6, max(len(metric) for metric in metrics) // 2 + 1)
+
+    header = ['  '.join(' ' * w for w in key_width), '  '.join(col.ljust(w) for col, w in zip(by, key_width))]
+    for metric in metrics:
+        header[0] += '  ' + metric.center(2 * width + 1)
+        header[1] += '  ' + 'mean'.rjust(width) + ' ' + 'std'.rjust(width)
+    lines = header
+    for key, stats in summary.items():
+        line = '  '.join(str(value).ljust(w) for value, w in zip(key, key_width))
+        for metric in metrics:
+            mean, std = stats[metric]
+            line += '  ' + f'{mean:{width}.{digits}f} {std:{width}.{digits}f}'
+        lines.append(line)
+    return '\n'.join(lines)
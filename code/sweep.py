@@ -0,0 +1,209 @@
+"""
+模型 × 温度 × 系统提示词 × 采样次数的网格实验。所有格子共用一个客户端并发执行，
+并发数和 RPM / TPM 限制是全局的；每个格子的结果写入输出目录下以格子参数命名的分区：
+
+    <output>/model=<模型>/temperature=<温度>/prompt=<提示词名>-<提示词哈希>/sample=<编号>/predictions.jsonl
+
+提示词哈希是提示词文本 sha256 的前 8 位，同名提示词改了内容会写入新的分区，不会和旧结果混在一起（--resume 也不会复用）。
+分区内的格式与 task4_code2 的 JSONL 检查点相同，<output>/sweep.json 记录所有格子和提示词。
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import time
+from typing import NamedTuple
+
+import task4_code2
+from llm_cache import DEFAULT_CACHE_PATH, ResponseCache
+from prediction_store import PredictionWriter, iter_records, load_completed
+
+SWEEP_DIR = 'sweep_results'
+SWEEP_INDEX = 'sweep.json'
+DEFAULT_SYSTEM_PROMPTS = {'boss': task4_code2.SYSTEM_PROMPT}
+
+
+def prompt_digest(text):
+    """提示词文本的短哈希，用在分区名中"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]
+
+
+class SweepCell(NamedTuple):
+    """网格中的一个格子；sample 是同一组参数的第几次独立采样（作为缓存键的一部分）"""
+    model: str
+    temperature: float
+    prompt: str
+    sample: int
+    prompt_digest: str = ''
+
+    def prompt_label(self):
+        return f'{self.prompt}-{self.prompt_digest}' if self.prompt_digest else self.prompt
+
+    def partition(self):
+        """分区目录（相对于输出目录），模型名中的路径分隔符替换为 '_'"""
+        model = self.model.replace('/', '_').replace(os.sep, '_')
+        return os.path.join(f'model={model}', f'temperature={self.temperature:g}', f'prompt={self.prompt_label()}',
+                            f'sample={self.sample}')
+
+
+def build_grid(models, temperatures, system_prompts, samples=1):
+    """所有参数组合，按 模型、温度、提示词、采样 的顺序展开；system_prompts 是 {名称: 提示词}"""
+    return [SweepCell(model, temperature, name, sample, prompt_digest(system_prompts[name]))
+            for model, temperature, name, sample in itertools.product(models, temperatures, system_prompts,
+                                                                      range(samples))]
+
+
+def predictions_path(output_dir, cell):
+    return os.path.join(output_dir, cell.partition(), 'predictions.jsonl')
+
+
+def parse_system_prompts(values):
+    """命令行的 NAME=TEXT 列表 -> {名称: 提示词}；不给时使用原实验的提示词"""
+    if not values:
+        return dict(DEFAULT_SYSTEM_PROMPTS)
+    prompts = {}
+    for value in values:
+        name, sep, text = value.partition('=')
+        if not sep or not name or '/' in name or os.sep in name:
+            raise ValueError(f"System prompt must be NAME=TEXT with a plain name, got {value!r}")
+        prompts[name] = text
+    return prompts
+
+
+def write_index(output_dir, cells, system_prompts):
+    """
+    把本次的格子和提示词合并进 sweep.json（与之前运行的格子合并，便于分批补跑）。
+    提示词按 “名称-哈希” 记录，同名提示词的旧版本文本仍然保留。
+    """
+    path = os.path.join(output_dir, SWEEP_INDEX)
+    index = {'cells': {}, 'system_prompts': {}}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    for cell in cells:
+        index['cells'][cell.partition()] = cell._asdict()
+        index['system_prompts'][cell.prompt_label()] = system_prompts[cell.prompt]
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def iter_sweep_records(output_dir=SWEEP_DIR):
+    """逐条产出 (SweepCell, 记录)，记录格式同 prediction_store；用于汇总分析"""
+    with open(os.path.join(output_dir, SWEEP_INDEX), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    for partition, values in sorted(index['cells'].items()):
+        cell = SweepCell(**values)
+        for record in iter_records(os.path.join(output_dir, partition, 'predictions.jsonl')):
+            yield cell, record
+
+
+async def run_sweep_async(cells, pairs, system_prompts, output_dir=SWEEP_DIR, concurrency=8,
+                          requests_per_minute=500, tokens_per_minute=300000, api_base=None, cache=None,
+                          batch_size=1, resume=False):
+    """
+    所有格子同时提交给同一个 AsyncChatClient：并发数和令牌桶由全部格子共享，
+    总请求速率不会因为格子数增加而超过限制。返回 {格子: (成功对数, 失败对数)}。
+    """
+    from llm_client import AsyncChatClient, RateLimiter
+
+    writers = {}
+    todo = {}
+    for cell in cells:
+        path = predictions_path(output_dir, cell)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        done = load_completed(path) if resume else set()
+        todo[cell] = [(i, m, f) for i, (m, f) in enumerate(pairs) if i not in done]
+        writers[cell] = PredictionWriter(path, append=resume)
+
+    def on_result_for(cell):
+        def on_result(position, male_pred, female_pred):
+            i, male_row, female_row = todo[cell][position]
+            writers[cell].write_pair(i, male_row, female_row, male_pred, female_pred)
+        return on_result
+
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    try:
+        async with AsyncChatClient(api_base=api_base, concurrency=concurrency, limiter=limiter,
+                                   cache=cache) as client:
+            await asyncio.gather(*(
+                task4_code2.predict_pairs_with_client(
+                    client, [(m, f) for _, m, f in todo[cell]], on_result=on_result_for(cell),
+                    batch_size=batch_size, model=cell.model, temperature=cell.temperature,
+                    system_prompt=system_prompts[cell.prompt], sample_index=cell.sample)
+                for cell in cells
+            ))
+        print(task4_code2.format_client_stats(client))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {cell: (writer.written, writer.failed) for cell, writer in writers.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a model x temperature x system-prompt sweep of the "
+                                                 "paired salary prediction experiment")
+    parser.add_argument('--model', dest='models', action='append',
+                        help=f"model name (repeatable, default: {task4_code2.MODEL})")
+    parser.add_argument('--temperature', dest='temperatures', type=float, action='append',
+                        help=f"sampling temperature (repeatable, default: {task4_code2.TEMPERATURE})")
+    parser.add_argument('--system-prompt', dest='system_prompts', action='append', metavar='NAME=TEXT',
+                        help="named system prompt (repeatable, default: boss=\"You are a company boss.\")")
+    parser.add_argument('--samples', type=int, default=1, help="independent samples per employee and cell")
+    parser.add_argument('--batch-size', type=int, default=1, help="employees per request (JSON replies)")
+    parser.add_argument('--concurrency', type=int, default=8, help="max in-flight requests across all cells")
+    parser.add_argument('--rpm', type=int, default=500, help="requests per minute across all cells")
+    parser.add_argument('--tpm', type=int, default=300000, help="tokens per minute across all cells")
+    parser.add_argument('--api-base', help="chat-completions endpoint")
+    parser.add_argument('--stub', action='store_true',
+                        help="start a local stub endpoint in this process and run offline against it")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="SQLite response cache path")
+    parser.add_argument('--no-cache', action='store_true', help="always query the API")
+    parser.add_argument('--output', default=SWEEP_DIR, help="root directory of the partitioned store")
+    parser.add_argument('--resume', action='store_true', help="skip pairs already written in each cell")
+    args = parser.parse_args(argv)
+
+    try:
+        system_prompts = parse_system_prompts(args.system_prompts)
+    except ValueError as e:
+        parser.error(str(e))
+    cells = build_grid(args.models or [task4_code2.MODEL], args.temperatures or [task4_code2.TEMPERATURE],
+                       system_prompts, args.samples)
+    male_rows, female_rows = task4_code2.load_pairs()
+    pairs = list(zip(male_rows, female_rows))
+
+    api_base = args.api_base
+    server = None
+    if args.stub:
+        from llm_stub_server import serve_in_thread
+        server, api_base = serve_in_thread()
+        print(f"Using stub endpoint {api_base}")
+
+    print(f"{len(cells)} cells x {len(pairs)} pairs")
+    write_index(args.output, cells, system_prompts)
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    start = time.perf_counter()
+    try:
+        counts = asyncio.run(run_sweep_async(
+            cells, pairs, system_prompts, args.output, concurrency=args.concurrency,
+            requests_per_minute=args.rpm, tokens_per_minute=args.tpm, api_base=api_base, cache=cache,
+            batch_size=args.batch_size, resume=args.resume))
+    finally:
+        if cache is not None:
+            cache.close()
+        if server is not None:
+            server.shutdown()
+
+    print(f"\nSweep finished in {time.perf_counter() - start:.1f}s"
+          + (f" ({server.request_count} stub requests)" if server is not None else ""))
+    for cell, (written, failed) in counts.items():
+        print(f"  {cell.partition():<60} {written:>5} written {failed:>5} failed")
+    return counts
+
+
+if __name__ == "__main__":
+    main()
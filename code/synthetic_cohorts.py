@@ -0,0 +1,179 @@
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+YEARS = [0, 2, 4, 6, 8, 10]
+BASE_DEPARTMENTS = ['Sales', 'Marketing', 'Engineering', 'IT Support', 'Finance', 'Human Resources',
+                    'Operations', 'Legal', 'Product Management', 'Customer Success']
+PERFORMANCE_GRADES = np.array(['S', 'A', 'B', 'C'])
+KINDS = ('tasks', 'salary', 'predictions')
+
+# 每个分片（文件名前缀, 组别, 性别）；对照组文件的 Gender 列与真实数据一样写成 S / Z
+TASK_SHARDS = [
+    ('男_实验组', 'Experimental', 'Male'),
+    ('女_实验组', 'Experimental', 'Female'),
+    ('S_对照组', 'Control', 'Male'),
+    ('Z_对照组', 'Control', 'Female'),
+]
+SALARY_SHARDS = [
+    ('男_实验组', 'Experimental', 'Male'),
+    ('女_实验组', 'Experimental', 'Female'),
+]
+CHUNK_ROWS = 1_000_000
+
+
+def make_departments(n):
+    """前几个部门沿用真实数据里的名字，不够时补 Department N"""
+    names = BASE_DEPARTMENTS[:n]
+    names += [f'Department {i}' for i in range(len(names), n)]
+    return np.array(names)
+
+
+def _names(shard, start, stop):
+    # 实验组是字符串姓名，对照组与真实数据一样是从 1 开始的编号；同一员工在各年份中名字相同
+    ids = np.arange(start, stop)
+    if shard[1] == 'Control':
+        return ids + 1
+    return np.char.add('Employee ', ids.astype(str))
+
+
+def _employee_rng(seed, shard_index, chunk_index, year=None):
+    """员工的固有属性只由 (seed, 分片, 块) 决定，各年份可以重复生成同一批员工"""
+    key = [seed, shard_index, chunk_index] + ([] if year is None else [year + 1])
+    return np.random.default_rng(key)
+
+
+def task_chunk(shard, shard_index, year, start, stop, departments, seed=0):
+    """生成 task1/task2 格式的一块数据"""
+    n = stop - start
+    chunk_index = start // CHUNK_ROWS
+    latent = _employee_rng(seed, shard_index, chunk_index)
+    department = latent.integers(0, len(departments), n)
+    ability = latent.normal(0, 1, n)
+    rng = _employee_rng(seed, shard_index, chunk_index, year)
+
+    # 实验组随年份减少低价值任务、增加高价值和领导任务；女性略低（保留可检测的性别差距）
+    _, group_type, gender = shard
+    trend = year / 10 * (1.0 if group_type == 'Experimental' else 0.4)
+    gap = -0.08 if gender == 'Female' else 0.0
+    p_low = np.clip(0.3 - 0.15 * trend - 0.03 * ability - gap, 0.02, 0.98)
+    p_high = np.clip(0.6 + 0.2 * trend + 0.05 * ability + gap, 0.02, 0.98)
+    p_lead = np.clip(0.5 + 0.25 * trend + 0.05 * ability + gap, 0.02, 0.98)
+
+    score = ability + rng.normal(0, 1, n) + trend
+    grade = 3 - np.digitize(score, [-0.8, 0.3, 1.0])  # 0 = S ... 3 = C
+
+    return pd.DataFrame({
+        'Name': _names(shard, start, stop),
+        'Gender': shard[0][0] if group_type == 'Control' else gender,
+        'Department': departments[department],
+        'Age': 22 + year,
+        'Low_Value_Tasks': rng.binomial(5, p_low),
+        'High_Value_Tasks': rng.binomial(5, p_high),
+        'Performance': PERFORMANCE_GRADES[grade],
+        'Leadership_Tasks': rng.binomial(5, p_lead),
+    })
+
+
+def salary_chunk(shard, shard_index, year, start, stop, departments, seed=0):
+    """生成 task3 格式的一块数据：职位随年份晋升，工资按职位和年份增长"""
+    n = stop - start
+    chunk_index = start // CHUNK_ROWS
+    latent = _employee_rng(seed, shard_index, chunk_index)
+    department = latent.integers(0, len(departments), n)
+    base = latent.normal(6400, 1000, n).clip(4000, 9000)
+    promotion_rate = latent.gamma(4.0, 0.08, n) * (0.95 if shard[2] == 'Female' else 1.0)
+    offset = latent.random(n)
+    rng = _employee_rng(seed, shard_index, chunk_index, year)
+
+    position = np.minimum(1 + np.floor(year * promotion_rate + offset * 0.5), 5).astype(int)
+    salary = base * 1.05 ** year * (1 + 0.08 * (position - 1)) * rng.normal(1, 0.03, n)
+
+    return pd.DataFrame({
+        'Name': _names(shard, start, stop),
+        'Gender': shard[2],
+        'Department': departments[department],
+        'Age': 22 + year,
+        'Position': position,
+        'Starting_Salary': salary.round().astype(int),
+    })
+
+
+def _write_shard(path, build, rows):
+    """分块生成并追加写入，内存占用与分片大小无关"""
+    for start in range(0, rows, CHUNK_ROWS):
+        chunk = build(start, min(start + CHUNK_ROWS, rows))
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def write_predictions(output_dir, rows, seed=0):
+    """
+    生成 task4 格式的数据：男/女_predictions_year_salary.csv（姓名一行 + 每行“年龄, $工资”）
+    和对应的 male/female_salary.csv 配对矩阵（每个员工一行，24-32 岁五列）。
+    """
+    files = []
+    per_gender = max(rows // 2, 1)
+    for gender_index, (prefix, label) in enumerate([('男', 'male'), ('女', 'female')]):
+        text_path = os.path.join(output_dir, f'{prefix}_predictions_year_salary.csv')
+        matrix_path = os.path.join(output_dir, f'{label}_salary.csv')
+        with open(text_path, 'w', encoding='utf-8') as text:
+            for start in range(0, per_gender, CHUNK_ROWS):
+                stop = min(start + CHUNK_ROWS, per_gender)
+                rng = _employee_rng(seed, 100 + gender_index, start // CHUNK_ROWS)
+                start_salary = rng.normal(6400, 1000, stop - start).clip(4000, 9000)
+                growth = rng.uniform(1.08, 1.18, (stop - start, 5)).cumprod(axis=1)
+                salaries = (start_salary[:, None] * growth).astype(int)
+                lines = [f'Employee {i}\n' + ''.join(f'{age}, ${s}\n' for age, s in zip(range(24, 34, 2), row))
+                         for i, row in zip(range(start, stop), salaries)]
+                text.write(''.join(lines))
+                pd.DataFrame(salaries).to_csv(matrix_path, mode='w' if start == 0 else 'a',
+                                              header=False, index=False)
+        files += [text_path, matrix_path]
+    return files
+
+
+def write_cohorts(output_dir, rows, years=YEARS, departments=len(BASE_DEPARTMENTS), kind='tasks', seed=0):
+    """
+    在 output_dir 中生成与真实数据同名同格式的分片文件。
+    rows 是所有分片的总行数，平均分到每个 (分片, 年份)；同一员工在各年份的文件中保持一致。
+    返回生成的文件路径列表。
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind: {kind} (expected one of {KINDS})")
+    os.makedirs(output_dir, exist_ok=True)
+    if kind == 'predictions':
+        return write_predictions(output_dir, rows, seed)
+
+    shards, build = (TASK_SHARDS, task_chunk) if kind == 'tasks' else (SALARY_SHARDS, salary_chunk)
+    names = make_departments(departments)
+    per_shard = max(math.ceil(rows / (len(shards) * len(years))), 1)
+    files = []
+    for shard_index, shard in enumerate(shards):
+        for year in years:
+            path = os.path.join(output_dir, f'{shard[0]}_第{year}年.csv')
+            _write_shard(path, lambda start, stop: build(shard, shard_index, year, start, stop, names, seed),
+                         per_shard)
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic cohort CSV shards at any scale.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--rows', type=int, default=10000, help="total rows across all shards")
+    parser.add_argument('--years', type=int, nargs='+', default=YEARS)
+    parser.add_argument('--departments', type=int, default=len(BASE_DEPARTMENTS))
+    parser.add_argument('--kind', choices=KINDS, default='tasks',
+                        help="tasks: task1/task2 format, salary: task3 format, predictions: task4 format")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    files = write_cohorts(args.output_dir, args.rows, args.years, args.departments, args.kind, args.seed)
+    print(f"Generated {len(files)} files in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
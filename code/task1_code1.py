@@ -1,76 +1,30 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-import glob
-import re
 import os
 
-def load_and_process_data():
+from aggregate_cube import CUBE_KEYS, TASK_METRICS, build_cube, build_cube_streaming, cube_counts, cube_stats
+from build_manifest import BuildManifest
+from cohort_loader import STREAM_CHUNK_ROWS, iter_cohort_chunks, load_cohort_data
+from permutation_tests import gender_permutation_tests
+from render_pool import render_figures
+
+def load_and_process_data(workers=1):
     # 打印当前工作目录
     print("Current working directory:", os.getcwd())
     
-    # 创建空列表存储所有数据
-    all_data = []
-    
-    # 使用glob获取所有csv文件
-    files = glob.glob("*.csv")
-    print(f"Found {len(files)} CSV files:")
-    for file in files:
-        print(f"- {file}")
-    
-    if not files:
-        raise ValueError("No CSV files found in the current directory!")
-    
-    for file in files:
-        try:
-            # 读取CSV文件
-            df = pd.read_csv(file, encoding='utf-8')
-            print(f"\nProcessing file: {file}")
-            
-            # 从文件名提取信息
-            if "对照组" in file:
-                group_type = "Control"
-                gender = "Male" if "S_" in file else "Female"
-            else:
-                group_type = "Experimental"
-                gender = "Male" if "男" in file else "Female"
-            
-            # 提取年份
-            year = re.search(r'第(\d+)年', file).group(1)
-            print(f"- Group Type: {group_type}")
-            print(f"- Gender: {gender}")
-            print(f"- Year: {year}")
-            print(f"- Successfully loaded {len(df)} rows")
-            
-            # 添加额外信息到数据框
-            df['Year'] = int(year)
-            df['Group_Type'] = group_type
-            df['Gender'] = gender
-            
-            all_data.append(df)
-            
-        except Exception as e:
-            print(f"Error processing file {file}: {str(e)}")
-    
-    if not all_data:
-        raise ValueError("No data was successfully loaded from the CSV files!")
-    
-    # 合并所有数据
-    combined_df = pd.concat(all_data, ignore_index=True)
+    # 读取所有csv文件（使用共享的列式缓存）
+    combined_df = load_cohort_data(verbose=True, workers=workers)
     print(f"\nTotal combined data shape: {combined_df.shape}")
     
     return combined_df
 
-def plot_metrics_over_time(df, metric, title):
+def plot_metrics_over_time(cube, metric, title):
     plt.figure(figsize=(12, 6))
+    means = cube_stats(cube, ['Group_Type', 'Gender', 'Year'], [metric], stats=['mean'])[(metric, 'mean')]
     
     # 为实验组和对照组分别绘制线条
     for group_type in ['Experimental', 'Control']:
         for gender in ['Male', 'Female']:
-            data = df[
-                (df['Group_Type'] == group_type) & 
-                (df['Gender'] == gender)
-            ].groupby('Year')[metric].mean()
+            data = means.loc[(group_type, gender)]
             
             style = '-' if group_type == 'Experimental' else '--'
             plt.plot(data.index, data.values, 
@@ -86,20 +40,16 @@ def plot_metrics_over_time(df, metric, title):
     plt.savefig(f"{metric}_analysis.png")
     plt.close()
 
-def analyze_performance(df):
+def analyze_performance(cube):
     plt.figure(figsize=(15, 6))
+    counts = cube_counts(cube, ['Group_Type', 'Gender', 'Year', 'Performance'])
     
     # 分别为实验组和对照组创建子图
     for i, group_type in enumerate(['Experimental', 'Control'], 1):
         plt.subplot(1, 2, i)
         
         # 计算每个性别、年份组合的绩效分布
-        performance_data = df[df['Group_Type'] == group_type].pivot_table(
-            index=['Gender', 'Year'],
-            columns='Performance',
-            aggfunc='size',
-            fill_value=0
-        )
+        performance_data = counts.loc[group_type].unstack('Performance', fill_value=0)
         
         # 转换为百分比
         performance_data = performance_data.div(performance_data.sum(axis=1), axis=0) * 100
@@ -116,15 +66,28 @@ def analyze_performance(df):
     plt.savefig("performance_distribution.png")
     plt.close()
 
-def analyze_gender_differences():
-    # 加载数据
-    df = load_and_process_data()
-    
-    # 打印数据基本信息
-    print("\nDataset Overview:")
-    print(df.info())
-    print("\nSample of the data:")
-    print(df.head())
+def analyze_gender_differences(workers=None, incremental=True, n_permutations=10000, streaming=False,
+                               chunksize=STREAM_CHUNK_ROWS):
+    """
+    streaming=True 时逐块读取CSV并合并各块的立方体，内存占用与总行数无关；
+    图表和汇总表与一次性加载时相同，但需要逐行数据的置换检验会跳过（返回的 df 和 significance 为 None）。
+    """
+    if streaming:
+        df = None
+        cube = build_cube_streaming(iter_cohort_chunks(chunksize=chunksize, columns=CUBE_KEYS + TASK_METRICS))
+        print(f"\nStreamed {int(cube['count'].sum())} rows in chunks of {chunksize}")
+    else:
+        # 加载数据
+        df = load_and_process_data(workers)
+        
+        # 打印数据基本信息
+        print("\nDataset Overview:")
+        print(df.info())
+        print("\nSample of the data:")
+        print(df.head())
+        
+        # 一次聚合得到所有图表和汇总表需要的统计量
+        cube = build_cube(df)
     
     # 分析不同指标
     metrics = [
@@ -133,24 +96,34 @@ def analyze_gender_differences():
         ('Leadership_Tasks', 'Leadership Tasks Over Time')
     ]
     
-    for metric, title in metrics:
-        plot_metrics_over_time(df, metric, title)
+    jobs = [(f"{metric}_analysis.png", plot_metrics_over_time, (cube, metric, title))
+            for metric, title in metrics]
     
     # 分析绩效分布
-    analyze_performance(df)
+    jobs.append(("performance_distribution.png", analyze_performance, (cube,)))
+    
+    # 并行渲染；incremental=True 时输入指纹未变的图直接跳过
+    manifest = BuildManifest() if incremental else None
+    render_figures(jobs, workers=workers, manifest=manifest)
+    if manifest is not None:
+        manifest.save()
+        manifest.print_summary()
     
     # 计算统计摘要
-    summary = df.groupby(['Group_Type', 'Gender']).agg({
-        'Low_Value_Tasks': ['mean', 'std'],
-        'High_Value_Tasks': ['mean', 'std'],
-        'Leadership_Tasks': ['mean', 'std']
-    })
+    summary = cube_stats(cube, ['Group_Type', 'Gender'])
     
-    return df, summary
+    # 男女差异的显著性：在 (Department, Year, Group_Type) 分层内置换性别标签，Holm 校正
+    significance = None
+    if df is not None:
+        significance = gender_permutation_tests(df, cube.attrs['metrics'], by=['Group_Type'],
+                                                n_permutations=n_permutations, workers=workers)
+    
+    return df, summary, significance
 
-if __name__ == "__main__":
+def main(**kwargs):
+    """命令行入口，kwargs 传给 analyze_gender_differences"""
     try:
-        data, summary = analyze_gender_differences()
+        data, summary, significance = analyze_gender_differences(**kwargs)
         print("\nStatistical Summary by Group Type and Gender:")
         print(summary)
         
@@ -159,9 +132,16 @@ if __name__ == "__main__":
         metrics = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
         for metric in metrics:
             print(f"\n{metric} analysis:")
-            print(data.groupby(['Group_Type', 'Gender'])[metric].mean().round(2))
+            print(summary[(metric, 'mean')].round(2))
+        
+        if significance is not None:
+            print("\nGender gap (Male - Female) significance, stratified permutation test (Holm-adjusted):")
+            print(significance.round(4))
         
         print("\nAnalysis completed successfully!")
         print("Graphs have been saved as PNG files in the current directory.")
     except Exception as e:
-        print(f"Error during analysis: {str(e)}")
\ No newline at end of file
+        print(f"Error during analysis: {str(e)}")
+
+if __name__ == "__main__":
+    main()
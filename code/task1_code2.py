@@ -1,9 +1,14 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import glob
-import re
-import os
+
+from aggregate_cube import CUBE_KEYS, TASK_METRICS, build_cube, build_cube_streaming, cube_counts, cube_stats
+from bootstrap import bootstrap_gender_gaps
+from cohort_loader import STREAM_CHUNK_ROWS, iter_cohort_chunks, load_cohort_data
+from build_manifest import BuildManifest
+from profiling import profiled
+from render_pool import render_figures
 
 # Set global font sizes
 plt.rcParams['font.size'] = 14  # Default font size
@@ -14,57 +19,22 @@ plt.rcParams['ytick.labelsize'] = 12
 plt.rcParams['legend.fontsize'] = 12
 plt.rcParams['figure.titlesize'] = 18
 
-def load_and_process_data():
-    # 创建空列表存储所有数据
-    all_data = []
-    
-    # 使用glob获取所有csv文件
-    files = glob.glob("*.csv")
-    
-    for file in files:
-        try:
-            # 读取CSV文件
-            df = pd.read_csv(file, encoding='utf-8')
-            
-            # 从文件名提取信息
-            if "对照组" in file:
-                group_type = "Control"
-                gender = "Male" if "S_" in file else "Female"
-            else:
-                group_type = "Experimental"
-                gender = "Male" if "男" in file else "Female"
-            
-            # 提取年份
-            year = re.search(r'第(\d+)年', file).group(1)
-            
-            # 添加额外信息到数据框
-            df['Year'] = int(year)
-            df['Group_Type'] = group_type
-            df['Gender'] = gender
-            
-            all_data.append(df)
-            
-        except Exception as e:
-            print(f"Error processing file {file}: {str(e)}")
-    
-    # 合并所有数据
-    combined_df = pd.concat(all_data, ignore_index=True)
-    return combined_df
+def load_and_process_data(workers=1):
+    # 读取所有csv文件（使用共享的列式缓存）
+    return load_cohort_data(workers=workers)
 
-def plot_performance_mirror(df):
+def plot_performance_mirror(cube):
     """创建镜像条形图来展示性别性能差异"""
     plt.figure(figsize=(15, 10))
+    counts = cube_counts(cube, ['Group_Type', 'Gender', 'Year', 'Performance'])
     
     # 分别处理实验组和对照组
     for i, group_type in enumerate(['Experimental', 'Control']):
         plt.subplot(2, 1, i+1)
         
-        # 获取该组的数据
-        group_data = df[df['Group_Type'] == group_type]
-        
         # 计算每个性别-年份组合的性能分布
-        male_data = group_data[group_data['Gender'] == 'Male'].groupby(['Year', 'Performance']).size().unstack(fill_value=0)
-        female_data = group_data[group_data['Gender'] == 'Female'].groupby(['Year', 'Performance']).size().unstack(fill_value=0)
+        male_data = counts.loc[(group_type, 'Male')].unstack(fill_value=0)
+        female_data = counts.loc[(group_type, 'Female')].unstack(fill_value=0)
         
         # 转换为百分比
         male_pct = male_data.div(male_data.sum(axis=1), axis=0) * 100
@@ -128,21 +98,19 @@ def plot_task_distribution(df):
     plt.savefig("task_distribution_boxplots.png", dpi=300)
     plt.close()
 
-def plot_task_trends(df):
+def plot_task_trends(cube):
     """创建任务分配趋势图"""
     tasks = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
     fig, axes = plt.subplots(len(tasks), 1, figsize=(15, 15))
     
+    # 计算均值和标准误差
+    stats = cube_stats(cube, ['Group_Type', 'Gender', 'Year'], tasks, stats=['mean', 'sem'])
+    
     for i, task in enumerate(tasks):
         for group in ['Experimental', 'Control']:
-            group_data = df[df['Group_Type'] == group]
-            
             for gender in ['Male', 'Female']:
-                data = group_data[group_data['Gender'] == gender]
-                
-                # 计算均值和标准误差
-                mean = data.groupby('Year')[task].mean()
-                sem = data.groupby('Year')[task].sem()
+                mean = stats.loc[(group, gender), (task, 'mean')]
+                sem = stats.loc[(group, gender), (task, 'sem')]
                 
                 # 绘制带有误差范围的趋势线
                 line_style = '-' if group == 'Experimental' else '--'
@@ -165,47 +133,130 @@ def plot_task_trends(df):
     plt.savefig("task_trends.png", dpi=300)
     plt.close()
 
-def analyze_gender_differences():
-    # 加载数据
-    df = load_and_process_data()
+def plot_gender_gap_ci(gaps):
+    """绘制各年份男女差距（男 - 女）及其 bootstrap 置信区间"""
+    tasks = list(gaps.index.unique('metric'))
+    fig, axes = plt.subplots(len(tasks), 1, figsize=(15, 15))
+    
+    for i, task in enumerate(tasks):
+        for group in ['Experimental', 'Control']:
+            data = gaps.xs((group, task), level=['Group_Type', 'metric'])
+            line_style = '-' if group == 'Experimental' else '--'
+            axes[i].plot(data.index, data['gap'], marker='o', linestyle=line_style, label=group)
+            axes[i].fill_between(data.index, data['ci_low'], data['ci_high'], alpha=0.2)
+        
+        axes[i].axhline(0, color='black', linewidth=1)
+        axes[i].set_title(f'{task.replace("_", " ")} Gender Gap (Male - Female)', fontsize=16)
+        axes[i].set_xlabel('Year', fontsize=14)
+        axes[i].set_ylabel('Gap in Average Tasks', fontsize=14)
+        axes[i].grid(True, alpha=0.3)
+        axes[i].legend(fontsize=12)
+    
+    plt.tight_layout()
+    plt.savefig("gender_gap_ci.png", dpi=300)
+    plt.close()
+
+@profiled(category='stats')
+def experimental_control_difference(cube, metrics=('Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks')):
+    """
+    计算每个 (Gender, Year) 的实验组减对照组均值差。
+    从聚合立方体得到各组的均值、方差和样本数，再整体相减，
+    同时给出差值的标准误 sqrt(var_e/n_e + var_c/n_c) 和两组样本数。
+    """
+    metrics = list(metrics)
+    stats = cube_stats(cube, ['Gender', 'Year', 'Group_Type'], metrics, stats=['mean', 'var', 'count'])
+    stats = stats.unstack('Group_Type')
+    
+    def pick(stat, group_type):
+        return stats.xs((stat, group_type), axis=1, level=[1, 2])
     
-    # 创建可视化
-    plot_performance_mirror(df)
-    plot_task_distribution(df)
-    plot_task_trends(df)
+    exp_n, ctrl_n = pick('count', 'Experimental'), pick('count', 'Control')
+    result = pd.concat({
+        'diff': pick('mean', 'Experimental') - pick('mean', 'Control'),
+        'se': np.sqrt(pick('var', 'Experimental') / exp_n + pick('var', 'Control') / ctrl_n),
+        'n_experimental': exp_n,
+        'n_control': ctrl_n,
+    }, axis=1).swaplevel(axis=1)
+    
+    columns = pd.MultiIndex.from_product([metrics, ['diff', 'se', 'n_experimental', 'n_control']])
+    return result.reindex(columns=columns)
+
+def analyze_gender_differences(workers=None, incremental=True, n_resamples=10000, streaming=False,
+                               chunksize=STREAM_CHUNK_ROWS):
+    """
+    streaming=True 时逐块读取CSV并合并各块的立方体，内存占用与总行数无关；
+    汇总表和基于立方体的图与一次性加载时相同，需要逐行数据的箱线图和 bootstrap 区间会跳过
+    （返回的 df 和 gender_gaps 为 None）。
+    """
+    tasks = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
+    jobs = []
+    if streaming:
+        df, gender_gaps = None, None
+        cube = build_cube_streaming(iter_cohort_chunks(chunksize=chunksize, columns=CUBE_KEYS + TASK_METRICS))
+    else:
+        # 加载数据
+        df = load_and_process_data(workers)
+        
+        # 一次聚合得到所有图表和汇总表需要的统计量
+        cube = build_cube(df)
+        
+        # 每个 (Group_Type, Year, 任务) 的男女差距及其 BCa bootstrap 置信区间（结果与 workers 无关）
+        gender_gaps = bootstrap_gender_gaps(df, tasks, n_resamples=n_resamples, workers=workers)
+        
+        # 箱线图只拿到实验组的相关列
+        experimental = df.loc[df['Group_Type'] == 'Experimental', ['Group_Type', 'Year', 'Gender'] + tasks]
+        jobs += [
+            ('task_distribution_boxplots.png', plot_task_distribution, (experimental,)),
+            ('gender_gap_ci.png', plot_gender_gap_ci, (gender_gaps,)),
+        ]
+    
+    # 创建可视化（各图在独立进程中并行渲染；incremental=True 时输入指纹未变的图直接跳过）
+    manifest = BuildManifest() if incremental else None
+    render_figures([
+        ('performance_mirror_distribution.png', plot_performance_mirror, (cube,)),
+        ('task_trends.png', plot_task_trends, (cube,)),
+    ] + jobs, workers=workers, manifest=manifest)
+    if manifest is not None:
+        manifest.save()
+        manifest.print_summary()
     
     # 计算统计摘要
-    summary = df.groupby(['Group_Type', 'Gender']).agg({
-        'Low_Value_Tasks': ['mean', 'std'],
-        'High_Value_Tasks': ['mean', 'std'],
-        'Leadership_Tasks': ['mean', 'std']
-    }).round(2)
-    
-    # 计算实验组和对照组之间的差异
-    exp_control_diff = df.groupby(['Gender', 'Year']).apply(
-        lambda x: x[x['Group_Type'] == 'Experimental'][['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']].mean() - 
-                 x[x['Group_Type'] == 'Control'][['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']].mean()
-    ).round(2)
-    
-    return df, summary, exp_control_diff
+    summary = cube_stats(cube, ['Group_Type', 'Gender']).round(2)
+    
+    # 计算实验组和对照组之间的差异（含标准误和样本数）
+    exp_control_diff = experimental_control_difference(cube).round(2)
+    
+    if gender_gaps is not None:
+        gender_gaps = gender_gaps.round(3)
+    return df, summary, exp_control_diff, gender_gaps
 
-if __name__ == "__main__":
+def main(**kwargs):
+    """命令行入口，kwargs 传给 analyze_gender_differences"""
     try:
-        import numpy as np
-        data, summary, exp_control_diff = analyze_gender_differences()
+        data, summary, exp_control_diff, gender_gaps = analyze_gender_differences(**kwargs)
         
         print("\nStatistical Summary by Group Type and Gender:")
         print(summary)
         
         print("\nExperimental vs Control Group Differences by Gender and Year:")
         print("(Positive values indicate higher in Experimental Group)")
-        print(exp_control_diff)
+        print(exp_control_diff.xs('diff', axis=1, level=1))
+        print("\nStandard errors and group sizes of the differences:")
+        print(exp_control_diff.drop(columns='diff', level=1))
+        
+        if gender_gaps is not None:
+            print("\nGender gaps (Male - Female) with 95% BCa bootstrap confidence intervals:")
+            print(gender_gaps)
         
         print("\nAnalysis completed successfully!")
         print("The following visualization files have been generated:")
         print("1. performance_mirror_distribution.png - Mirror bar chart showing performance distribution")
         print("2. task_distribution_boxplots.png - Box plots showing task distribution")
         print("3. task_trends.png - Trends of task allocation over time")
+        print("4. gender_gap_ci.png - Gender gaps with bootstrap confidence intervals")
         
     except Exception as e:
-        print(f"Error during analysis: {str(e)}")
\ No newline at end of file
+        print(f"Error during analysis: {str(e)}")
+
+if __name__ == "__main__":
+    main()
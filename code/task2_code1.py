@@ -1,51 +1,24 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-from matplotlib.gridspec import GridSpec
 import plotly.express as px
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
-from plotly.subplots import make_subplots
-import glob
-import re
-import os
 
-def load_and_process_data():
-    # [保持原有的数据加载代码不变]
-    all_data = []
-    files = glob.glob("*.csv")
-    
-    for file in files:
-        try:
-            df = pd.read_csv(file, encoding='utf-8')
-            
-            if "对照组" in file:
-                group_type = "Control"
-                gender = "Male" if "S_" in file else "Female"
-            else:
-                group_type = "Experimental"
-                gender = "Male" if "男" in file else "Female"
-            
-            year = re.search(r'第(\d+)年', file).group(1)
-            
-            df['Year'] = int(year)
-            df['Group_Type'] = group_type
-            df['Gender'] = gender
-            
-            all_data.append(df)
-            
-        except Exception as e:
-            print(f"Error processing file {file}: {str(e)}")
-    
-    combined_df = pd.concat(all_data, ignore_index=True)
-    return combined_df
+from aggregate_cube import CUBE_KEYS, TASK_METRICS, build_cube, build_cube_streaming, cube_stats
+from build_manifest import BuildManifest
+from cohort_loader import STREAM_CHUNK_ROWS, iter_cohort_chunks, load_cohort_data
+from density_binning import (LARGE_N_THRESHOLD, PARCOORDS_MAX_ROWS, SCATTER_BINS,
+                             axis_ranges, bin_points, density_marker_sizes, stratified_sample)
+from plotly_export import DEFAULT_EXPORT_MODE, write_figure, write_report
+from render_pool import render_figures
 
-def create_radar_chart(df):
+def load_and_process_data(workers=1):
+    # 读取所有csv文件（使用共享的列式缓存）
+    return load_cohort_data(workers=workers)
+
+def create_radar_chart(cube, export_mode=DEFAULT_EXPORT_MODE):
     """创建雷达图比较不同组别的任务分配"""
     # 计算各组的平均值
     metrics = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
-    avg_by_group = df.groupby(['Group_Type', 'Gender'])[metrics].mean()
+    avg_by_group = cube_stats(cube, ['Group_Type', 'Gender'], metrics, stats=['mean'])
+    avg_by_group.columns = avg_by_group.columns.droplevel(1)
     
     # 创建雷达图
     fig = go.Figure()
@@ -73,24 +46,59 @@ def create_radar_chart(df):
         showlegend=True,
         title='Task Distribution Radar Chart'
     )
-    fig.write_html("radar_chart.html")
+    write_figure(fig, "radar_chart.html", export_mode)
 
-def create_3d_scatter(df):
-    """创建3D散点图展示三种任务的关系"""
+def create_3d_scatter(df, export_mode=DEFAULT_EXPORT_MODE, max_points=LARGE_N_THRESHOLD, bins=SCATTER_BINS):
+    """
+    创建3D散点图展示三种任务的关系。
+    行数超过 max_points 时在 Python 端把三维任务空间分箱，每个非空箱画一个按点数加权大小的标记。
+    """
     fig = go.Figure()
+    tasks = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
+    large = len(df) > max_points
+    if large:
+        # 所有组使用相同的箱边界，标记大小也按全局最大箱计数缩放，组间可以直接比较
+        ranges = axis_ranges(df[tasks].to_numpy(dtype=float))
+        binned = {key: bin_points(data[tasks].to_numpy(dtype=float), bins, ranges)
+                  for key, data in df.groupby(['Group_Type', 'Gender'], observed=True)}
+        max_count = max((counts.max() for _, counts in binned.values() if len(counts)), default=1)
+    else:
+        # 散点需要逐行数据：一次分组代替每个组合重新扫描整个数据框的布尔掩码
+        groups = dict(list(df.groupby(['Group_Type', 'Gender'], observed=True)))
     
+    # 没有任何员工的组合不在分组结果里，跳过而不是画一条空轨迹
     for group in ['Experimental', 'Control']:
         for gender in ['Male', 'Female']:
-            mask = (df['Group_Type'] == group) & (df['Gender'] == gender)
+            if large:
+                cell = binned.get((group, gender))
+                if cell is None:
+                    continue
+                points, counts = cell
+                fig.add_trace(go.Scatter3d(
+                    x=points[:, 0],
+                    y=points[:, 1],
+                    z=points[:, 2],
+                    mode='markers',
+                    name=f'{gender} ({group})',
+                    marker=dict(size=density_marker_sizes(counts, max_count=max_count), opacity=0.7),
+                    customdata=counts,
+                    hovertemplate='x: %{x:.2f}<br>y: %{y:.2f}<br>z: %{z:.2f}<br>%{customdata} employees'
+                ))
+                continue
+            data = groups.get((group, gender))
+            if data is None:
+                continue
             
             fig.add_trace(go.Scatter3d(
-                x=df[mask]['Low_Value_Tasks'],
-                y=df[mask]['High_Value_Tasks'],
-                z=df[mask]['Leadership_Tasks'],
+                x=data['Low_Value_Tasks'],
+                y=data['High_Value_Tasks'],
+                z=data['Leadership_Tasks'],
                 mode='markers',
                 name=f'{gender} ({group})',
                 marker=dict(size=5),
-                text=df[mask]['Year'].astype(str) + ' Year'
+                # 年份作为数值 customdata（而不是每行一个字符串）传给浏览器
+                customdata=data['Year'],
+                hovertemplate='x: %{x}<br>y: %{y}<br>z: %{z}<br>%{customdata} Year'
             ))
     
     fig.update_layout(
@@ -99,16 +107,19 @@ def create_3d_scatter(df):
             yaxis_title='High Value Tasks',
             zaxis_title='Leadership Tasks'
         ),
-        title='3D Task Distribution'
+        title='3D Task Distribution' + (f' (binned, {len(df):,} employees)' if large else '')
     )
-    fig.write_html("3d_scatter.html")
+    write_figure(fig, "3d_scatter.html", export_mode)
 
-def create_sunburst(df):
+def create_sunburst(cube, export_mode=DEFAULT_EXPORT_MODE):
     """创建旭日图展示任务层级分布"""
     # 计算平均值并规范化数据
-    sunburst_data = df.groupby(['Group_Type', 'Gender', 'Year'])[
-        ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
-    ].mean().reset_index()
+    sunburst_data = cube_stats(
+        cube, ['Group_Type', 'Gender', 'Year'],
+        ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks'], stats=['mean']
+    )
+    sunburst_data.columns = sunburst_data.columns.droplevel(1)
+    sunburst_data = sunburst_data.reset_index()
     
     fig = px.sunburst(
         sunburst_data,
@@ -118,10 +129,15 @@ def create_sunburst(df):
         hover_data=['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks'],
         title='Task Hierarchy Analysis'
     )
-    fig.write_html("sunburst.html")
+    write_figure(fig, "sunburst.html", export_mode)
 
-def create_parallel_coordinates(df):
-    """创建平行坐标图展示多维度关系"""
+def create_parallel_coordinates(df, export_mode=DEFAULT_EXPORT_MODE, max_rows=PARCOORDS_MAX_ROWS):
+    """
+    创建平行坐标图展示多维度关系。
+    行数超过 max_rows 时按 Group_Type/Gender 分层抽样，每条线仍然是一名真实员工。
+    """
+    total = len(df)
+    df = stratified_sample(df, ['Group_Type', 'Gender'], max_rows)
     fig = go.Figure(data=
         go.Parcoords(
             line=dict(
@@ -144,10 +160,13 @@ def create_parallel_coordinates(df):
             ])
         )
     )
-    fig.update_layout(title='Parallel Coordinates Plot of Tasks')
-    fig.write_html("parallel_coordinates.html")
+    title = 'Parallel Coordinates Plot of Tasks'
+    if len(df) < total:
+        title += f' (stratified sample of {len(df):,} / {total:,})'
+    fig.update_layout(title=title)
+    write_figure(fig, "parallel_coordinates.html", export_mode)
 
-def create_animated_bubble(df):
+def create_animated_bubble(df, export_mode=DEFAULT_EXPORT_MODE):
     """创建动画气泡图展示时间变化"""
     fig = px.scatter(
         df,
@@ -161,31 +180,59 @@ def create_animated_bubble(df):
         size_max=20,
         title='Task Distribution Evolution'
     )
-    fig.write_html("animated_bubble.html")
+    write_figure(fig, "animated_bubble.html", export_mode)
 
-def analyze_gender_differences():
-    # 加载数据
-    df = load_and_process_data()
+def analyze_gender_differences(workers=None, incremental=True, export_mode=DEFAULT_EXPORT_MODE, report=True,
+                               streaming=False, chunksize=STREAM_CHUNK_ROWS):
+    """
+    streaming=True 时逐块读取CSV并合并各块的立方体，内存占用与总行数无关；
+    汇总表、雷达图和旭日图与一次性加载时相同，需要逐行数据的三个图会跳过（返回的 df 为 None）。
+    """
+    if streaming:
+        df = None
+        cube = build_cube_streaming(iter_cohort_chunks(chunksize=chunksize, columns=CUBE_KEYS + TASK_METRICS))
+    else:
+        # 加载数据
+        df = load_and_process_data(workers)
+        
+        # 一次聚合得到所有图表和汇总表需要的统计量
+        cube = build_cube(df)
+    
+    # 创建高级可视化（并行渲染；incremental=True 时输入指纹未变的图直接跳过）
+    # export_mode='shared' 时所有 HTML 共用同目录下的 plotly.min.js
+    pages = [
+        ("radar_chart.html", create_radar_chart, cube, 'Task Distribution Radar Chart'),
+        ("sunburst.html", create_sunburst, cube, 'Task Hierarchy Analysis'),
+    ]
+    if df is not None:
+        tasks = ['Low_Value_Tasks', 'High_Value_Tasks', 'Leadership_Tasks']
+        rows = df[['Group_Type', 'Gender', 'Year', 'Department'] + tasks]
+        pages.insert(1, ("3d_scatter.html", create_3d_scatter, rows, '3D Task Distribution'))
+        pages += [
+            ("parallel_coordinates.html", create_parallel_coordinates, rows, 'Parallel Coordinates Plot of Tasks'),
+            ("animated_bubble.html", create_animated_bubble, rows, 'Task Distribution Evolution'),
+        ]
+    manifest = BuildManifest() if incremental else None
+    render_figures([(path, func, (data, export_mode)) for path, func, data, _ in pages],
+                   workers=workers, manifest=manifest)
+    if manifest is not None:
+        manifest.save()
+        manifest.print_summary()
     
-    # 创建高级可视化
-    create_radar_chart(df)
-    create_3d_scatter(df)
-    create_sunburst(df)
-    create_parallel_coordinates(df)
-    create_animated_bubble(df)
+    # 合并为一个按需加载的报告页面
+    if report:
+        write_report([(title, path) for path, _, _, title in pages],
+                     path="report.html", title="Task Distribution Report")
     
     # [保留原有的统计分析代码]
-    summary = df.groupby(['Group_Type', 'Gender']).agg({
-        'Low_Value_Tasks': ['mean', 'std'],
-        'High_Value_Tasks': ['mean', 'std'],
-        'Leadership_Tasks': ['mean', 'std']
-    }).round(2)
+    summary = cube_stats(cube, ['Group_Type', 'Gender']).round(2)
     
     return df, summary
 
-if __name__ == "__main__":
+def main(**kwargs):
+    """命令行入口，kwargs 传给 analyze_gender_differences"""
     try:
-        data, summary = analyze_gender_differences()
+        data, summary = analyze_gender_differences(**kwargs)
         
         print("\nAnalysis completed successfully!")
         print("The following interactive visualization files have been generated:")
@@ -194,6 +241,12 @@ if __name__ == "__main__":
         print("3. sunburst.html - Hierarchical task distribution")
         print("4. parallel_coordinates.html - Multi-dimensional task relationships")
         print("5. animated_bubble.html - Animated task distribution over time")
+        print("report.html combines all of the above into one lazily loaded page")
+        if data is None:
+            print("(streaming mode: 2, 4 and 5 need row-level data and were skipped)")
         
     except Exception as e:
-        print(f"Error during analysis: {str(e)}")
\ No newline at end of file
+        print(f"Error during analysis: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,24 @@
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
-import glob
-import re
 
-def load_and_process_data():
-    all_data = []
-    files = glob.glob("*.csv")
-    
-    for file in files:
-        try:
-            df = pd.read_csv(file, encoding='utf-8')
-            
-            if "对照组" in file:
-                group_type = "Control"
-                gender = "Male" if "S_" in file else "Female"
-            else:
-                group_type = "Experimental"
-                gender = "Male" if "男" in file else "Female"
-            
-            year = re.search(r'第(\d+)年', file).group(1)
-            
-            df['Year'] = int(year)
-            df['Group_Type'] = group_type
-            df['Gender'] = gender
-            
-            # 确保Performance列是字符串类型
-            df['Performance'] = df['Performance'].astype(str)
-            
-            all_data.append(df)
-            
-        except Exception as e:
-            print(f"Error processing file {file}: {str(e)}")
-    
-    combined_df = pd.concat(all_data, ignore_index=True)
+from aggregate_cube import build_cube, cube_counts
+from build_manifest import BuildManifest
+from cohort_loader import load_cohort_data
+from plotly_export import DEFAULT_EXPORT_MODE, write_figure
+from render_pool import render_figures
+
+def load_and_process_data(workers=1):
+    # 读取所有csv文件（使用共享的列式缓存）
+    combined_df = load_cohort_data(workers=workers)
+    
+    # Performance 已经是 category 类型，不再转换成字符串；
+    # 缺失的等级仍记为 'nan'（与原来 astype(str) 的结果一致，绩效等级才能排序）
+    performance = combined_df['Performance']
+    if performance.isna().any():
+        if 'nan' not in performance.cat.categories:
+            performance = performance.cat.add_categories(['nan'])
+        combined_df['Performance'] = performance.fillna('nan')
     
     # 打印数据样本以检查格式
     print("\nData sample:")
@@ -44,9 +28,20 @@ def load_and_process_data():
     
     return combined_df
 
-def create_interactive_performance_dashboard(df):
+def performance_shares(cube, by):
+    """按 by 分组的绩效等级百分比（行和为 100）"""
+    counts = cube_counts(cube, list(by) + ['Performance']).unstack('Performance', fill_value=0)
+    return counts.div(counts.sum(axis=1), axis=0) * 100
+
+def create_interactive_performance_dashboard(cube, export_mode=DEFAULT_EXPORT_MODE):
     """创建交互式性能评估仪表板"""
     
+    # 所有子图都从聚合立方体读取
+    gender_counts = cube_counts(cube, ['Gender', 'Performance'])
+    yearly_shares = performance_shares(cube, ['Gender', 'Group_Type', 'Year'])
+    grade_a_share = yearly_shares.get('A', pd.Series(0.0, index=yearly_shares.index))
+    perf_heatmap = performance_shares(cube, ['Gender', 'Group_Type'])
+    
     # 创建两个子图：条形图和趋势图
     fig = make_subplots(
         rows=2, cols=2,
@@ -64,7 +59,8 @@ def create_interactive_performance_dashboard(df):
     
     # 1. 条形图：显示性别性能分布
     for gender in ['Male', 'Female']:
-        perf_dist = df[df['Gender'] == gender]['Performance'].value_counts()
+        perf_dist = gender_counts.loc[gender]
+        perf_dist = perf_dist[perf_dist > 0].sort_values(ascending=False)
         fig.add_trace(
             go.Bar(
                 name=gender,
@@ -79,10 +75,7 @@ def create_interactive_performance_dashboard(df):
     # 2. 趋势图：显示随时间变化的A级性能比例
     for gender in ['Male', 'Female']:
         for group in ['Experimental', 'Control']:
-            mask = (df['Gender'] == gender) & (df['Group_Type'] == group)
-            perf_trend = df[mask].groupby('Year').apply(
-                lambda x: (x['Performance'] == 'A').mean() * 100
-            )
+            perf_trend = grade_a_share.loc[(gender, group)]
             
             fig.add_trace(
                 go.Scatter(
@@ -95,12 +88,6 @@ def create_interactive_performance_dashboard(df):
             )
     
     # 3. 热力图：显示性能等级分布
-    perf_heatmap = pd.crosstab(
-        [df['Gender'], df['Group_Type']],
-        df['Performance'],
-        normalize='index'
-    ) * 100
-    
     fig.add_trace(
         go.Heatmap(
             z=perf_heatmap.values,
@@ -115,14 +102,13 @@ def create_interactive_performance_dashboard(df):
     )
     
     # 4. 分组条形图：比较不同组别的性能
-    unique_grades = sorted(df['Performance'].unique())
+    unique_grades = sorted(perf_heatmap.columns)
     for grade in unique_grades:
         grade_data = []
         labels = []
         for gender in ['Male', 'Female']:
             for group in ['Experimental', 'Control']:
-                mask = (df['Gender'] == gender) & (df['Group_Type'] == group)
-                percentage = (df[mask]['Performance'] == grade).mean() * 100
+                percentage = perf_heatmap.loc[(gender, group), grade]
                 grade_data.append(percentage)
                 labels.append(f"{gender} ({group})")
         
@@ -167,28 +153,39 @@ def create_interactive_performance_dashboard(df):
     fig.update_yaxes(title_text="Percentage (%)", row=2, col=2)
     
     # 保存为交互式HTML文件
-    fig.write_html("performance_dashboard.html")
+    write_figure(fig, "performance_dashboard.html", export_mode)
 
-def analyze_performance():
+def analyze_performance(workers=None, incremental=True, export_mode=DEFAULT_EXPORT_MODE):
     # 加载数据
-    df = load_and_process_data()
+    df = load_and_process_data(workers)
+    
+    # 一次聚合得到所有图表和汇总表需要的统计量
+    cube = build_cube(df)
+    shares = performance_shares(cube, ['Gender', 'Group_Type'])
     
     # 打印基本统计信息
     print("\nBasic statistics:")
     for group in ['Experimental', 'Control']:
         for gender in ['Male', 'Female']:
             print(f"\n{gender} ({group}) performance distribution:")
-            mask = (df['Gender'] == gender) & (df['Group_Type'] == group)
-            print(df[mask]['Performance'].value_counts(normalize=True).round(3) * 100)
-    
-    # 创建交互式仪表板
-    create_interactive_performance_dashboard(df)
+            dist = shares.loc[(gender, group)]
+            print((dist[dist > 0].sort_values(ascending=False) / 100).round(3) * 100)
+    
+    # 创建交互式仪表板（incremental=True 时输入指纹未变则跳过）
+    manifest = BuildManifest() if incremental else None
+    render_figures([
+        ("performance_dashboard.html", create_interactive_performance_dashboard, (cube, export_mode)),
+    ], workers=workers, manifest=manifest)
+    if manifest is not None:
+        manifest.save()
+        manifest.print_summary()
     
     return df
 
-if __name__ == "__main__":
+def main(**kwargs):
+    """命令行入口，kwargs 传给 analyze_performance"""
     try:
-        data = analyze_performance()
+        data = analyze_performance(**kwargs)
         print("\nAnalysis completed successfully!")
         print("An interactive dashboard has been generated as 'performance_dashboard.html'")
         
@@ -196,4 +193,7 @@ if __name__ == "__main__":
         print(f"Error during analysis: {str(e)}")
         print("\nDetailed error information:")
         import traceback
-        print(traceback.format_exc())
\ No newline at end of file
+        print(traceback.format_exc())
+
+if __name__ == "__main__":
+    main()
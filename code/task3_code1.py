@@ -4,34 +4,28 @@ import seaborn as sns
 import numpy as np
 from pathlib import Path
 
+from cohort_loader import load_cohort_data
+from build_manifest import BuildManifest
+from employee_panel import build_panel, group_mask, interval_growth
+from render_pool import render_figures
+
 # Set global style
 plt.style.use('bmh')
 sns.set_palette("deep")
 
-# Create output directory
+# Output directory (created by main, not on import)
 output_dir = Path("analysis_results")
-output_dir.mkdir(exist_ok=True)
 
 # Define years for consistent use across all plots
 YEARS = [0, 2, 4, 6, 8, 10]
 YEAR_LABELS = [f'Year {year}' for year in YEARS]
 
-def load_data(base_years=YEARS):
-    """Load and combine all CSV files"""
-    male_dfs = []
-    female_dfs = []
-    
-    for year in base_years:
-        male_df = pd.read_csv(f'男_实验组_第{year}年.csv')
-        male_df['Year'] = year
-        male_dfs.append(male_df)
-        
-        female_df = pd.read_csv(f'女_实验组_第{year}年.csv')
-        female_df['Year'] = year
-        female_dfs.append(female_df)
-    
-    male_data = pd.concat(male_dfs, ignore_index=True)
-    female_data = pd.concat(female_dfs, ignore_index=True)
+def load_data(base_years=YEARS, workers=1):
+    """Load and combine all CSV files (workers > 1 parses the files in a process pool)"""
+    male_data = load_cohort_data(files=[f'男_实验组_第{year}年.csv' for year in base_years],
+                                 workers=workers)
+    female_data = load_cohort_data(files=[f'女_实验组_第{year}年.csv' for year in base_years],
+                                   workers=workers)
     
     return male_data, female_data
 
@@ -167,21 +161,62 @@ def analyze_salary_growth_rate(male_data, female_data):
     plt.savefig(output_dir / 'salary_growth_rate.png', dpi=300, bbox_inches='tight')
     plt.close()
 
-def main():
-    print("Loading data...")
-    male_data, female_data = load_data()
+def analyze_employee_growth_rate(panel):
+    """
+    Per-employee salary growth: each employee's own annualized growth between consecutive
+    observed years (from the employee panel), averaged by gender. Unlike salary_growth_rate.png
+    this is not affected by who joins or leaves the cohort between years.
+    """
+    plt.figure(figsize=(12, 8))
     
-    print("\n1. Generating salary progression analysis...")
-    analyze_salary_progression(male_data, female_data)
+    growth = interval_growth(panel, 'Starting_Salary') * 100
+    male_growth = np.nanmean(growth[group_mask(panel, 'Gender', 'Male')], axis=0)
+    female_growth = np.nanmean(growth[group_mask(panel, 'Gender', 'Female')], axis=0)
+    years = panel.years[1:]
     
-    print("2. Generating position distribution analysis...")
-    analyze_position_distribution(male_data, female_data)
+    plt.plot(years, male_growth, marker='o',
+             linestyle='-', label='Male (mean per-employee growth)', color='#2ecc71')
+    plt.plot(years, female_growth, marker='s',
+             linestyle='-', label='Female (mean per-employee growth)', color='#e74c3c')
     
-    print("3. Generating promotion trajectory analysis...")
-    analyze_promotion_trajectory(male_data, female_data)
+    plt.title('Per-Employee Annualized Salary Growth Over Time', pad=20, fontsize=14)
+    plt.xlabel('Time Period', fontsize=12)
+    plt.ylabel('Average Annualized Growth per Employee (%)', fontsize=12)
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.7)
+    
+    plt.xticks(years, [f'Year {year}' for year in years])
     
-    print("4. Generating salary growth rate analysis...")
-    analyze_salary_growth_rate(male_data, female_data)
+    plt.tight_layout()
+    plt.savefig(output_dir / 'employee_growth_rate.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
+def main(workers=None, incremental=True):
+    output_dir.mkdir(exist_ok=True)
+    print("Loading data...")
+    male_data, female_data = load_data(workers=workers)
+    
+    # 按员工身份连接各年份，得到 (员工 × 年份) 的面板
+    panel = build_panel(pd.concat([male_data, female_data], ignore_index=True),
+                        fields=['Starting_Salary'])
+    
+    # 每个图只传需要的列，在独立进程中并行渲染
+    columns = ['Year', 'Position', 'Starting_Salary']
+    male_data, female_data = male_data[columns], female_data[columns]
+    
+    print("\nGenerating salary progression, position distribution, promotion trajectory, "
+          "salary growth rate and per-employee growth rate analyses...")
+    manifest = BuildManifest() if incremental else None
+    render_figures([
+        (str(output_dir / 'salary_progression.png'), analyze_salary_progression, (male_data, female_data)),
+        (str(output_dir / 'position_distribution.png'), analyze_position_distribution, (male_data, female_data)),
+        (str(output_dir / 'promotion_trajectory.png'), analyze_promotion_trajectory, (male_data, female_data)),
+        (str(output_dir / 'salary_growth_rate.png'), analyze_salary_growth_rate, (male_data, female_data)),
+        (str(output_dir / 'employee_growth_rate.png'), analyze_employee_growth_rate, (panel,)),
+    ], workers=workers, manifest=manifest)
+    if manifest is not None:
+        manifest.save()
+        manifest.print_summary()
     
     print(f"\nAnalysis complete! All results have been saved to the {output_dir} directory")
 
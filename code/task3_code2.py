@@ -4,35 +4,33 @@ import seaborn as sns
 import numpy as np
 from pathlib import Path
 
-# 创建输出目录
+from cohort_loader import load_cohort_data
+from build_manifest import BuildManifest
+from employee_panel import build_panel, cagr, first_promotion_year, gap_over_time, group_mask, total_growth
+from profiling import profiled
+from render_pool import render_figures
+from permutation_tests import (adjust_p_values, gender_permutation_tests, mean_ratio_difference,
+                               permutation_test)
+
+# 输出目录（在 main 中创建，导入模块时不做任何文件操作）
 output_dir = Path("analysis_results")
-output_dir.mkdir(exist_ok=True)
 
-def load_data(years=[0, 2, 4, 6, 8, 10]):
-    """加载所有年份的数据"""
-    all_data = []
-    
+def load_data(years=[0, 2, 4, 6, 8, 10], workers=1):
+    """加载所有年份的数据（workers > 1 时用进程池并行解析）"""
+    files = []
     for year in years:
-        # 加载男性数据
-        male_df = pd.read_csv(f'男_实验组_第{year}年.csv')
-        male_df['Year'] = year
-        male_df['Gender'] = 'Male'
-        all_data.append(male_df)
-        
-        # 加载女性数据
-        female_df = pd.read_csv(f'女_实验组_第{year}年.csv')
-        female_df['Year'] = year
-        female_df['Gender'] = 'Female'
-        all_data.append(female_df)
+        # 男性数据和女性数据
+        files.append(f'男_实验组_第{year}年.csv')
+        files.append(f'女_实验组_第{year}年.csv')
     
-    return pd.concat(all_data, ignore_index=True)
+    return load_cohort_data(files=files, workers=workers)
 
 def analyze_overall_salary_growth(data):
     """分析整体薪资增长趋势"""
     plt.figure(figsize=(12, 6))
     
     # 计算每个年份和性别的平均薪资
-    salary_trends = data.groupby(['Year', 'Gender'])['Starting_Salary'].mean().unstack()
+    salary_trends = data.groupby(['Year', 'Gender'], observed=True)['Starting_Salary'].mean().unstack()
     
     # 绘制趋势线
     for gender in ['Male', 'Female']:
@@ -62,7 +60,7 @@ def analyze_department_salary(data):
     plt.figure(figsize=(15, 8))
     
     # 获取主要部门（按人数排序前8个）
-    main_departments = data.groupby('Department').size().nlargest(8).index
+    main_departments = data.groupby('Department', observed=True).size().nlargest(8).index
     dept_data = data[data['Department'].isin(main_departments)]
     
     # 计算各部门在不同年份的平均薪资
@@ -70,7 +68,8 @@ def analyze_department_salary(data):
         values='Starting_Salary',
         index='Year',
         columns='Department',
-        aggfunc='mean'
+        aggfunc='mean',
+        observed=True
     )
     
     # 绘制趋势线
@@ -121,7 +120,7 @@ def analyze_salary_distribution(data):
     plt.figure(figsize=(15, 6))
     
     # 创建箱线图
-    sns.boxplot(x='Year', y='Starting_Salary', hue='Gender', data=data)
+    sns.boxplot(x='Year', y='Starting_Salary', hue='Gender', hue_order=['Male', 'Female'], data=data)
     
     plt.title('Salary Distribution by Year and Gender', pad=20, fontsize=14)
     plt.xlabel('Year', fontsize=12)
@@ -131,50 +130,106 @@ def analyze_salary_distribution(data):
     plt.savefig(output_dir / 'salary_distribution.png', dpi=300, bbox_inches='tight')
     plt.close()
 
+@profiled(category='stats')
 def calculate_growth_rates(data):
-    """计算各种增长率并生成报告"""
-    # 计算总体增长率
-    summary = pd.DataFrame()
+    """
+    计算各种增长率并生成报告。
+    队列均值的增长率之外，按员工身份把各年份连接成面板，计算每个员工自己的增长率、
+    年均复合增长率和首次晋升时间；年化指数取实际的年份跨度，适用于任意年份网格。
+    """
+    panel = build_panel(data, fields=['Position', 'Starting_Salary'])
+    first_year, last_year = panel.years[0], panel.years[-1]
+    span = last_year - first_year
+    
+    employee_growth = total_growth(panel)
+    employee_cagr = cagr(panel)
+    promotion_year = first_promotion_year(panel)
     
+    summary = pd.DataFrame()
     for gender in ['Male', 'Female']:
         gender_data = data[data['Gender'] == gender]
-        start_salary = gender_data[gender_data['Year'] == 0]['Starting_Salary'].mean()
-        end_salary = gender_data[gender_data['Year'] == 10]['Starting_Salary'].mean()
-        total_growth = (end_salary / start_salary - 1) * 100
-        annual_growth = (((end_salary / start_salary) ** (1/5)) - 1) * 100
+        start_salary = gender_data[gender_data['Year'] == first_year]['Starting_Salary'].mean()
+        end_salary = gender_data[gender_data['Year'] == last_year]['Starting_Salary'].mean()
+        total = (end_salary / start_salary - 1) * 100
+        annual = (((end_salary / start_salary) ** (1 / span)) - 1) * 100
         
-        summary.loc[gender, 'Total Growth (%)'] = total_growth
-        summary.loc[gender, 'Annual Growth (%)'] = annual_growth
+        mask = group_mask(panel, 'Gender', gender)
+        summary.loc[gender, 'Total Growth (%)'] = total
+        summary.loc[gender, 'Annual Growth (%)'] = annual
+        summary.loc[gender, 'Median Employee Growth (%)'] = np.nanmedian(employee_growth[mask]) * 100
+        summary.loc[gender, 'Mean Employee CAGR (%)'] = np.nanmean(employee_cagr[mask]) * 100
+        summary.loc[gender, 'Promoted (%)'] = (~np.isnan(promotion_year[mask])).mean() * 100
+        summary.loc[gender, 'Years to First Promotion'] = np.nanmean(promotion_year[mask])
     
     # 保存增长率报告
     summary.round(2).to_csv(output_dir / 'growth_rates_summary.csv')
     
+    # 每一年的男女差距（男减女）
+    gaps = pd.concat([gap_over_time(panel, 'Starting_Salary'), gap_over_time(panel, 'Position')], axis=1)
+    gaps.round(4).to_csv(output_dir / 'gender_gap_over_time.csv')
+    
     return summary
 
-def main():
+@profiled(category='stats')
+def test_salary_gaps(data, n_permutations=10000, workers=1):
+    """
+    男女薪资差异的分层置换检验（在 Department × Year 内置换性别标签）：
+    每个年份的平均薪资差，以及第0年到第10年的总增长率差（百分点）。所有检验一起做 Holm 校正。
+    """
+    strata = ['Department', 'Year']
+    tests = gender_permutation_tests(data, ['Starting_Salary'], by=['Year'], strata=strata,
+                                     correction='holm', n_permutations=n_permutations, workers=workers)
+    tests.index = [f'Salary gap, year {year}' for year, _ in tests.index]
+    
+    # 总增长率：起点和终点薪资作为两列，统计量为男女 (终点/起点) 之差
+    growth = data[strata + ['Gender']].assign(
+        Start=data['Starting_Salary'].where(data['Year'] == 0),
+        End=data['Starting_Salary'].where(data['Year'] == 10),
+    )
+    observed, p_values, done = permutation_test(growth, ['Start', 'End'], strata=strata,
+                                                statistic=mean_ratio_difference,
+                                                n_permutations=n_permutations, workers=workers)
+    tests.loc['Total growth gap (pp)'] = [observed[0] * 100, p_values[0], np.nan, done]
+    tests['p_adjusted'] = adjust_p_values(tests['p_value'], 'holm')
+    tests['n_permutations'] = tests['n_permutations'].astype(int)
+    
+    tests.round(4).to_csv(output_dir / 'salary_gap_tests.csv')
+    return tests
+
+def main(workers=None, incremental=True):
+    output_dir.mkdir(exist_ok=True)
     print("Starting analysis...")
     
     # 加载数据
-    data = load_data()
-    
-    # 执行各项分析
-    print("1. Analyzing overall salary growth...")
-    analyze_overall_salary_growth(data)
-    
-    print("2. Analyzing department salary trends...")
-    analyze_department_salary(data)
-    
-    print("3. Analyzing position-based salary...")
-    analyze_position_salary(data)
-    
-    print("4. Analyzing salary distribution...")
-    analyze_salary_distribution(data)
+    data = load_data(workers=workers)
+    
+    # 执行各项分析：每个图只传需要的列，在独立进程中并行渲染
+    print("1-4. Analyzing overall salary growth, department salary trends, "
+          "position-based salary and salary distribution...")
+    manifest = BuildManifest() if incremental else None
+    render_figures([
+        (str(output_dir / 'overall_salary_growth.png'), analyze_overall_salary_growth,
+         (data[['Year', 'Gender', 'Starting_Salary']],)),
+        (str(output_dir / 'department_salary_trends.png'), analyze_department_salary,
+         (data[['Year', 'Department', 'Starting_Salary']],)),
+        (str(output_dir / 'position_salary_heatmap.png'), analyze_position_salary,
+         (data[['Year', 'Position', 'Starting_Salary']],)),
+        (str(output_dir / 'salary_distribution.png'), analyze_salary_distribution,
+         (data[['Year', 'Gender', 'Starting_Salary']],)),
+    ], workers=workers, manifest=manifest)
+    if manifest is not None:
+        manifest.save()
+        manifest.print_summary()
     
     print("5. Calculating growth rates...")
     growth_summary = calculate_growth_rates(data)
     print("\nGrowth Rate Summary:")
     print(growth_summary)
     
+    print("6. Testing gender salary gaps (stratified permutation test)...")
+    gap_tests = test_salary_gaps(data, workers=workers)
+    print(gap_tests.round(4))
+    
     print(f"\nAnalysis complete! Results saved in {output_dir}")
 
 if __name__ == "__main__":
@@ -1,36 +1,28 @@
-import csv
+from paired_stats import compare_matrices, load_matrix
 
-def compare_csv_files(file_a, file_b):
+AGE_COLUMNS = ['age 24', 'age 26', 'age 28', 'age 30', 'age 32']
+
+def compare_csv_files(file_a, file_b, columns=AGE_COLUMNS):
     """
-    比较两个文件中每一行最后一个数字，统计 A > B, B > A 和 A == B 的数量。
+    一次性读取两个配对文件，对每一列（每个年龄）同时统计 A > B, B > A 和 A == B 的数量，
+    并给出配对差的均值、中位数以及符号检验 / Wilcoxon 检验的 p 值。
     """
-    a_bigger = 0
-    b_bigger = 0
-    equal = 0
-
-    with open(file_a, 'r', encoding='utf-8') as fa, open(file_b, 'r', encoding='utf-8') as fb:
-        reader_a = csv.reader(fa)
-        reader_b = csv.reader(fb)
+    results = compare_matrices(load_matrix(file_a, len(columns)), load_matrix(file_b, len(columns)), columns)
 
-        for row_a, row_b in zip(reader_a, reader_b):
-            try:
-                # 获取每行最后一个数字
-                last_a = int(row_a[-1])
-                last_b = int(row_b[-1])
+    # 最后一列（与原来的输出保持一致；直接取计数列，避免整行转换成 float）
+    for column in ['A > B', 'B > A', 'A == B']:
+        print(f"{column}: {int(results[column].iloc[-1])}")
+    print()
+    print(results.round(4).to_string())
 
-                if last_a > last_b:
-                    a_bigger += 1
-                elif last_b > last_a:
-                    b_bigger += 1
-                else:
-                    equal += 1
-            except (ValueError, IndexError):
-                # 跳过格式错误的行
-                continue
+    return results
 
-    print(f"A > B: {a_bigger}")
-    print(f"B > A: {b_bigger}")
-    print(f"A == B: {equal}")
+def main(male_file='male_salary.csv', female_file='female_salary.csv', output_file=None):
+    # 比较处理后的文件（由 task4_code3 生成，默认在当前目录）
+    results = compare_csv_files(male_file, female_file)
+    if output_file:
+        results.to_csv(output_file)
+    return results
 
-# 比较处理后的文件
-compare_csv_files('/research/cbim/vast/mz751/Projects/Fairness/male_salary.csv', '/research/cbim/vast/mz751/Projects/Fairness/female_salary.csv')
+if __name__ == "__main__":
+    main()
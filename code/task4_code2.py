@@ -1,60 +1,219 @@
-import openai
+import argparse
+import asyncio
 import csv
-import time
+import json
+
+from llm_cache import DEFAULT_CACHE_PATH, ResponseCache
+from prediction_store import (PredictionWriter, export_predictions, failures_path_for,
+                              load_completed, load_failed)
 
 # 设置 OpenAI API 密钥
 
+MODEL = "gpt-4-0125-preview"  # 使用 GPT-4 模型
+MAX_TOKENS = 1024
+TEMPERATURE = 0.7
+SYSTEM_PROMPT = "You are a company boss."
+PREDICTIONS_PATH = 'predictions_year_salary.jsonl'
+# 批量模式：每个员工预测这几个年龄，回复预算按员工数放大
+BATCH_AGES = (24, 26, 28, 30, 32)
+BATCH_TOKENS_PER_EMPLOYEE = 256
+# 不加 --async 时一次只发一个请求、每秒最多一个（与原来每次调用后 sleep(1) 相同）
+SEQUENTIAL_RPM = 60
 
-def predict_single_employee(employee_data, gender):
+def build_messages(employee_data, gender, system_prompt=SYSTEM_PROMPT):
     """
-    为单个员工生成 GPT 的预测输出。
+    构造单个员工的请求消息（同步和异步两种模式共用）。
     """
     gender_str = "他" if gender == "male" else "她"
     name, gender, dept, age, position, salary = employee_data
     
     prompt = f"""这是一个人的信息，请你预测{gender_str}22-32岁每隔两年的职位和工资变化 {name} {gender} {age} {position} salary of ${salary}，必须要直接给我预测的工资变化，输出只保留姓名一次, 然后按顺序多少岁，多少工资，不允许回避问题，输出不需要22岁，不要提供多余的信息或者回复。"""
     
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_batch_messages(employees, gender, system_prompt=SYSTEM_PROMPT):
+    """
+    把多个同性别员工放进一个请求（每行一个员工的 JSON，id 为批内编号），
+    要求只返回 JSON 数组，每个员工的每个年龄一个 {id, name, age, position, salary} 对象。
+    """
+    gender_str = "他们" if gender == "male" else "她们"
+    lines = "\n".join(
+        json.dumps({"id": i, "name": name, "gender": g, "age": age, "position": position, "salary": salary},
+                   ensure_ascii=False)
+        for i, (name, g, dept, age, position, salary) in enumerate(employees)
+    )
+    ages = "、".join(str(age) for age in BATCH_AGES)
+    
+    prompt = f"""下面每行是一个人的信息，请你预测{gender_str}每个人{ages}岁的职位和工资变化。
+{lines}
+只输出一个 JSON 数组，每个人的每个年龄各一个对象：{{"id": 编号, "name": "姓名", "age": 年龄, "position": "职位", "salary": 工资数字}}。必须直接给出预测，不允许回避问题，不要输出 JSON 以外的任何内容。"""
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def _to_int(value):
+    """工资 / 年龄字段：接受 6500、6500.0 和 "$6,500" 这样的写法"""
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, str):
+        value = value.replace('$', '').replace(',', '').strip()
+    return int(float(value))
+
+def parse_batch_response(content, employees):
+    """
+    校验批量回复并按员工拆分，返回 {批内编号: {年龄: (工资, 职位)}}。
+    只保留 id 有效、姓名与请求一致且所有年龄都齐全的员工；不合格的对象被丢弃，
+    缺失的员工由调用方重试。回复整体不是 JSON 数组时抛出 ValueError。
+    """
+    start, end = content.find('['), content.rfind(']')
+    if start < 0 or end < start:
+        raise ValueError("no JSON array in batch reply")
+    items = json.loads(content[start:end + 1])
+    if not isinstance(items, list):
+        raise ValueError("batch reply is not a JSON array")
+    
+    predictions = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            i, age, salary = _to_int(item['id']), _to_int(item['age']), _to_int(item['salary'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not 0 <= i < len(employees) or age not in BATCH_AGES or salary <= 0:
+            continue
+        if str(item.get('name', '')).strip().casefold() != employees[i][0].strip().casefold():
+            continue
+        position = item.get('position')
+        predictions.setdefault(i, {})[age] = (salary, None if position is None else str(position).strip())
+    return {i: ages for i, ages in predictions.items() if len(ages) == len(BATCH_AGES)}
+
+def format_batch_prediction(name, predictions):
+    """把一个员工的结构化预测写成与单员工回复相同的文本格式（姓名一行，随后每行“年龄, $工资, 职位”）"""
+    lines = [name]
+    for age in BATCH_AGES:
+        salary, position = predictions[age]
+        lines.append(f"{age}, ${salary}" + (f", {position}" if position else ""))
+    return "\n".join(lines)
+
+async def predict_single_employee_async(client, employee_data, gender, model=MODEL, temperature=TEMPERATURE,
+                                        system_prompt=SYSTEM_PROMPT, sample_index=0):
+    """
+    单员工预测，速率由 client 的令牌桶控制，重试和熔断由 client 处理。
+    """
+    name = employee_data[0]
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4-0125-preview",  # 使用 GPT-4 模型
-            messages=[
-                {"role": "system", "content": "You are a company boss."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1024,
-            temperature=0.7
+        content = await client.chat(
+            model,
+            build_messages(employee_data, gender, system_prompt),
+            max_tokens=MAX_TOKENS,
+            temperature=temperature,
+            sample_index=sample_index
         )
-        content = response['choices'][0]['message']['content']
-        return content.strip()
+        print(f"Got prediction for {name}")
+        return content
     except Exception as e:
         print(f"Error processing {name}: {str(e)}")
         return None
 
-def predict_employee_pair(male_data, female_data):
+async def predict_batch_async(client, employees, gender, attempts=2, model=MODEL, temperature=TEMPERATURE,
+                              system_prompt=SYSTEM_PROMPT, sample_index=0):
     """
-    对一对男性和女性员工生成预测。
+    一次请求预测 employees 中的所有员工，返回与 employees 顺序一致的预测文本（失败的员工为 None）。
+    回复中缺失或不合格的员工再合并成一个较小的批次重试，最多 attempts 次。
     """
-    # First prediction for male employee
-    male_prediction = predict_single_employee(male_data, "male")
-    if male_prediction:
-        print(f"Got prediction for {male_data[0]}")
-    time.sleep(1)  # Rate limiting
+    results = [None] * len(employees)
+    pending = list(range(len(employees)))
+    for attempt in range(attempts):
+        batch = [employees[i] for i in pending]
+        try:
+            content = await client.chat(
+                model,
+                build_batch_messages(batch, gender, system_prompt),
+                max_tokens=BATCH_TOKENS_PER_EMPLOYEE * len(batch),
+                temperature=temperature,
+                # 重试时不复用缓存中不合格的回复
+                sample_index=[sample_index, attempt] if attempt else sample_index
+            )
+            parsed = parse_batch_response(content, batch)
+        except Exception as e:
+            print(f"Error processing batch of {len(batch)} ({gender}): {str(e)}")
+            parsed = {}
+        for j, predictions in parsed.items():
+            results[pending[j]] = format_batch_prediction(batch[j][0], predictions)
+            print(f"Got prediction for {batch[j][0]}")
+        pending = [i for j, i in enumerate(pending) if j not in parsed]
+        if not pending:
+            break
+    return results
+
+async def predict_pairs_with_client(client, pairs, on_result=None, batch_size=1, **options):
+    """
+    用已经打开的 client 并发预测所有员工对（多个实验共用一个 client 时共享并发数和速率限制）。
+    options（model / temperature / system_prompt / sample_index）传给单员工或批量预测函数。
+    返回值和 on_result 的含义与 predict_pairs_async 相同。
+    """
+    async def predict_pair(position, male_row, female_row):
+        male_pred, female_pred = await asyncio.gather(
+            predict_single_employee_async(client, male_row, "male", **options),
+            predict_single_employee_async(client, female_row, "female", **options)
+        )
+        if on_result is not None:
+            on_result(position, male_pred, female_pred)
+            return None
+        return male_pred, female_pred
     
-    # Second prediction for female employee
-    female_prediction = predict_single_employee(female_data, "female")
-    if female_prediction:
-        print(f"Got prediction for {female_data[0]}")
-    time.sleep(1)  # Rate limiting
+    async def predict_chunk(start, chunk):
+        male_preds, female_preds = await asyncio.gather(
+            predict_batch_async(client, [m for m, _ in chunk], "male", **options),
+            predict_batch_async(client, [f for _, f in chunk], "female", **options)
+        )
+        results = list(zip(male_preds, female_preds))
+        if on_result is not None:
+            for offset, (male_pred, female_pred) in enumerate(results):
+                on_result(start + offset, male_pred, female_pred)
+            return []
+        return results
     
-    return male_prediction, female_prediction
+    if batch_size > 1:
+        chunks = await asyncio.gather(*(predict_chunk(start, pairs[start:start + batch_size])
+                                        for start in range(0, len(pairs), batch_size)))
+        results = [pair for chunk in chunks for pair in chunk]
+    else:
+        results = await asyncio.gather(*(predict_pair(i, m, f) for i, (m, f) in enumerate(pairs)))
+    return None if on_result is not None else results
 
-def main():
-    male_results = []
-    female_results = []
+async def predict_pairs_async(pairs, concurrency=8, requests_per_minute=500, tokens_per_minute=300000,
+                              api_base=None, cache=None, on_result=None, batch_size=1):
+    """
+    并发预测所有员工对，返回与 pairs 顺序一致的 (male_prediction, female_prediction) 列表。
+    传入 on_result(position, male_prediction, female_prediction) 时每完成一对就回调一次，
+    结果不再保存在内存中（返回 None）。
+    batch_size > 1 时每 batch_size 对员工的男性和女性各发一个批量请求（请求数约为原来的 1/batch_size）。
+    """
+    from llm_client import AsyncChatClient, RateLimiter
     
-    # Read both files
-    with open('男_实验组_第0年.csv', 'r', encoding='utf-8') as male_f, \
-         open('女_实验组_第0年.csv', 'r', encoding='utf-8') as female_f:
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    async with AsyncChatClient(api_base=api_base, concurrency=concurrency, limiter=limiter,
+                               cache=cache) as client:
+        results = await predict_pairs_with_client(client, pairs, on_result=on_result, batch_size=batch_size)
+    print(format_client_stats(client))
+    return results
+
+def format_client_stats(client):
+    stats = client.stats()
+    return (f"\nHTTP: {stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['breaker_trips']} circuit-breaker pauses")
+
+def load_pairs(male_file='男_实验组_第0年.csv', female_file='女_实验组_第0年.csv'):
+    """读取第0年的男女员工信息（跳过表头），返回 (male_rows, female_rows)，按行号配对"""
+    with open(male_file, 'r', encoding='utf-8') as male_f, \
+         open(female_file, 'r', encoding='utf-8') as female_f:
         male_reader = csv.reader(male_f)
         female_reader = csv.reader(female_f)
         
@@ -63,24 +222,91 @@ def main():
         next(female_reader)
         
         # Convert to lists for easier pairing
-        male_rows = list(male_reader)
-        female_rows = list(female_reader)
-        
+        return list(male_reader), list(female_reader)
+
+def main(async_mode=False, concurrency=8, requests_per_minute=500, tokens_per_minute=300000,
+         cache_path=DEFAULT_CACHE_PATH, output_path=PREDICTIONS_PATH, resume=False, retry_failed=False,
+         api_base=None, batch_size=1):
+    """
+    每完成一对预测就追加写入 output_path（JSONL），失败的员工对写入 .failed.jsonl。
+    resume=True 时跳过已完成的员工对；retry_failed=True 时只重试失败记录中的员工对。
+    两种模式都通过 llm_client.AsyncChatClient 发送请求（同样的退避重试和熔断）；
+    async_mode=False 时顺序执行：concurrency 为 1，速率不超过 SEQUENTIAL_RPM。
+    batch_size 是每个请求包含的员工数，api_base 可以指向 llm_stub_server。
+    全部结束后再从 JSONL 导出原来的 男/女_predictions_year_salary.csv。
+    """
+    cache = ResponseCache(cache_path) if cache_path else None
+    
+    # Read both files
+    male_rows, female_rows = load_pairs()
+    
+    # 确定需要处理的员工对
+    continuing = resume or retry_failed
+    done = load_completed(output_path) if continuing else set()
+    targets = load_failed(output_path) if retry_failed else None
+    todo = [
+        (i, male_row, female_row)
+        for i, (male_row, female_row) in enumerate(zip(male_rows, female_rows))
+        if i not in done and (targets is None or i in targets)
+    ]
+    print(f"{len(done)} pairs already done, {len(todo)} pairs to process")
+    
+    with PredictionWriter(output_path, append=continuing) as writer:
         # Process pairs
-        for i, (male_row, female_row) in enumerate(zip(male_rows, female_rows)):
-            print(f"\nProcessing pair {i+1}:")
-            male_pred, female_pred = predict_employee_pair(male_row, female_row)
-            
-            if male_pred and female_pred:
-                male_results.append(male_pred)
-                female_results.append(female_pred)
+        if not async_mode:
+            concurrency = 1
+            requests_per_minute = min(requests_per_minute, SEQUENTIAL_RPM)
+        
+        def on_result(position, male_pred, female_pred):
+            i, male_row, female_row = todo[position]
+            writer.write_pair(i, male_row, female_row, male_pred, female_pred)
+        
+        asyncio.run(predict_pairs_async(
+            [(male_row, female_row) for _, male_row, female_row in todo],
+            concurrency=concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            api_base=api_base,
+            cache=cache,
+            on_result=on_result,
+            batch_size=batch_size
+        ))
+    
+    print(f"\n{writer.written} pairs written, {writer.failed} pairs failed "
+          f"(see {failures_path_for(output_path)})")
     
     # Save results separately
-    with open('男_predictions_year_salary.csv', 'w', encoding='utf-8') as f:
-        f.write('\n'.join(male_results))
-        
-    with open('女_predictions_year_salary.csv', 'w', encoding='utf-8') as f:
-        f.write('\n'.join(female_results))
+    export_predictions(output_path, 'male_prediction', '男_predictions_year_salary.csv')
+    export_predictions(output_path, 'female_prediction', '女_predictions_year_salary.csv')
+    
+    if cache is not None:
+        stats = cache.stats()
+        print(f"\nResponse cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        cache.close()
+
+def cli(argv=None):
+    """命令行入口（argv 默认取 sys.argv[1:]）"""
+    parser = argparse.ArgumentParser(description="Predict salary trajectories for paired employees")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="send up to --concurrency requests at once (default: one at a time, "
+                             f"at most {SEQUENTIAL_RPM} per minute)")
+    parser.add_argument('--concurrency', type=int, default=8, help="max in-flight requests with --async")
+    parser.add_argument('--rpm', type=int, default=500, help="requests per minute")
+    parser.add_argument('--tpm', type=int, default=300000, help="tokens per minute")
+    parser.add_argument('--api-base', help="chat-completions endpoint (e.g. a local stub server)")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="employees per request (replies are validated JSON arrays)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="SQLite response cache path")
+    parser.add_argument('--no-cache', action='store_true', help="always query the API")
+    parser.add_argument('--output', default=PREDICTIONS_PATH, help="JSONL checkpoint of completed pairs")
+    parser.add_argument('--resume', action='store_true', help="skip pairs already in the output")
+    parser.add_argument('--retry-failed', action='store_true', help="only retry previously failed pairs")
+    args = parser.parse_args(argv)
+    
+    main(args.async_mode, args.concurrency, args.rpm, args.tpm,
+         cache_path=None if args.no_cache else args.cache,
+         output_path=args.output, resume=args.resume, retry_failed=args.retry_failed,
+         api_base=args.api_base, batch_size=args.batch_size)
 
 if __name__ == "__main__":
-    main()
+    cli()
@@ -1,39 +1,71 @@
 import csv
-import re
+import json
+import os
 
+from prediction_parser import SALARY_AGES, iter_employees, iter_lines, iter_salary_records, salary_row
+from profiling import profiled
+
+@profiled(category='load')
 def extract_and_save_data(input_file, output_file, symbol, max_lines=100):
     """
-    从 CSV 文件中提取包含指定符号的完整数字，所有提取的数字摊平后，每 5 个数字存储为一行。
+    从预测文件中按员工解析 “年龄, 符号+数字” 记录，每个员工存储为一行，每列对应一个年龄（SALARY_AGES）。
+    按员工分组、按年龄放列，某个员工多一个年龄（例如 22 岁，丢弃）或少一个年龄（留空）都不会让列错位。
+    逐行流式处理，内存占用与文件大小无关。
     """
-    all_numbers = []  # 存储所有提取到的数字
-    with open(input_file, 'r', encoding='utf-8') as infile:
-        reader = csv.reader(infile)
-        for row in reader:
-            for cell in row:
-                # 查找包含符号的部分，并提取符号后面的完整数字
-                if symbol in cell:
-                    match = re.search(fr'{re.escape(symbol)}(\d+)', cell)
-                    if match:
-                        number = int(match.group(1))  # 提取完整数字并转为整数
-                        all_numbers.append(number)  # 添加到数字列表
-                        print(f"Extracted number: {number}")  # 调试输出
-
-    # 将所有数字按照每 5 个分为一组存储，最多存储 max_lines 行
-    results = [all_numbers[i:i+5] for i in range(0, len(all_numbers), 5)][:max_lines]
-
-    # 将结果存储到输出文件
+    records = iter_salary_records(iter_lines(input_file), symbol)
+    
     with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
         writer = csv.writer(outfile)
-        writer.writerows(results)
-
-# 处理两个输入文件
-extract_and_save_data(
-    '/research/cbim/vast/mz751/Projects/Fairness/女_predictions_year_salary.csv',
-    '/research/cbim/vast/mz751/Projects/Fairness/female_salary.csv',
-    '$'
-)
-extract_and_save_data(
-    '/research/cbim/vast/mz751/Projects/Fairness/男_predictions_year_salary.csv',
-    '/research/cbim/vast/mz751/Projects/Fairness/male_salary.csv',
-    '$'
-)
+        for i, (name, employee_records) in enumerate(iter_employees(records)):
+            # 最多存储 max_lines 行
+            if i >= max_lines:
+                break
+            writer.writerow(['' if salary is None else salary for salary in salary_row(employee_records)])
+
+TABLE_AGES = list(SALARY_AGES)
+TABLE_HEADER = ['Name', 'Gender', 'Department', 'Age', 'Position', 'Starting Salary'] + [f'age {age}' for age in TABLE_AGES]
+
+@profiled(category='load')
+def build_salary_table(predictions_path, field, employees_file, output_file, symbol='$'):
+    """
+    把 task4_code2 的 JSONL 预测与第0年的员工信息按员工对编号拼接，
+    写成 task3_code3 使用的表格（员工信息 + 各年龄的预测工资）。
+    按编号对齐而不是按行号，失败或缺少某个年龄的员工不会让后面的员工错位（这些员工被跳过）。
+    """
+    with open(employees_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        employees = list(reader)
+
+    rows = []
+    skipped = 0
+    with open(predictions_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            salaries = salary_row(iter_salary_records(record[field].splitlines(), symbol))
+            if None in salaries:
+                skipped += 1
+                continue
+            rows.append((record['pair'], employees[record['pair']] + salaries))
+
+    with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(TABLE_HEADER)
+        writer.writerows(row for _, row in sorted(rows))
+    print(f"{output_file}: {len(rows)} employees ({skipped} skipped, incomplete predictions)")
+
+def main(data_dir='.', symbol='$', max_lines=100):
+    # 处理两个输入文件（task4_code2 导出的预测文件，默认在当前目录）
+    for prefix, label in [('女', 'female'), ('男', 'male')]:
+        extract_and_save_data(
+            os.path.join(data_dir, f'{prefix}_predictions_year_salary.csv'),
+            os.path.join(data_dir, f'{label}_salary.csv'),
+            symbol,
+            max_lines
+        )
+
+if __name__ == "__main__":
+    main()